@@ -1,52 +1,41 @@
 
-from rag_engine.converters.structuring_json import create_structured_json
-from rag_engine.converters.vector_build import build_vector_db
+from rag_engine.converters.vector_build import prune_missing_documents
+from rag_engine.ingest import ingest_document
+from rag_engine.pipeline import run_pipeline
 import os
-from docx2pdf import convert
-
-import time
-def convert_docx_to_pdf(docx_path):
-
-    pdf_path = docx_path.replace(".docx", ".pdf")
-    convert(docx_path, pdf_path)
-
-    return pdf_path
 
+# "pipeline" overlaps parsing, embedding and db writes across files (see rag_engine/pipeline.py),
+# "sequential" ingests one file after the other. Both honour PERSIST_SECTIONS_DIR,
+# STREAM_INGESTION (see rag_engine/ingest.py) only applies to "sequential"
+INGEST_MODE = os.environ.get("INGEST_MODE", "pipeline")
 
 def process_root_directory():
 
     root_dir = os.getcwd()
+    file_paths = []
 
-    for file in os.listdir(root_dir):
-
-        file_path = os.path.join(root_dir, file)
-
-        if file.endswith(".pdf"):
-
-            print("PDF detected:", file)
-
-            create_structured_json(file_path)
+    for file in sorted(os.listdir(root_dir)):
 
-            time.sleep(3)
+        # .docx is read directly with python-docx, no pdf conversion step
+        if file.endswith((".pdf", ".docx")):
 
-            build_vector_db("structured.json")
+            print("Document detected:", file)
+            file_paths.append(os.path.join(root_dir, file))
 
+    if INGEST_MODE == "pipeline":
+        run_pipeline(file_paths)
+    else:
+        for file_path in file_paths:
+            ingest_document(file_path)
 
-        elif file.endswith(".docx"):
-
-            print("DOCX detected:", file)
-
-            pdf_path = convert_docx_to_pdf(file_path)
-
-            create_structured_json(pdf_path)
-
-            time.sleep(3)
-
-            build_vector_db("structured.json")
+    # documents deleted or renamed since the last run would otherwise stay searchable
+    prune_missing_documents()
 
     print("Processing complete.")
 
-process_root_directory()
+# the pipeline's worker processes re-import this file, only the parent may ingest
+if __name__ == "__main__":
+    process_root_directory()
 
 # ----------------------------
 # Continuous Test Loop
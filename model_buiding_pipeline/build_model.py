@@ -6,23 +6,33 @@ Label space:
 1 -> HEADING
 
 Uses:
-- check.py (extract_pdf_lines, main_ex)
+- rag_engine extractor (extract_document_lines, DocumentProfile)
 - weak_labels_final.json (SILVER labels)
 
 NOTE:
 - Evaluation here is sanity-check only
 - Real evaluation must be done on manually labeled PDFs
+
+Run from the repo root: python -m model_buiding_pipeline.build_model
 """
 
 import json
 import os
+import tempfile
+import time
 import joblib
-from sklearn.ensemble import RandomForestClassifier
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.metrics import classification_report, confusion_matrix, f1_score
 
-from modularity.converters.extract_classify.insights import main_ex
-from modularity.converters.extract_classify.extractor import extract_document_lines
+from rag_engine.converters.extract_classify.insights import DocumentProfile
+from rag_engine.converters.extract_classify.extractor import extract_document_lines
+from rag_engine.converters.extract_classify.forest import export_forest, FlatForest
+from rag_engine.converters.extract_classify.features import FEATURE_ORDER, build_feature_matrix
 
 
 # -----------------------------
@@ -42,6 +52,22 @@ PDF_PATHS = [
 
 LABELS_PATH = "weak_labels_final.json"
 MODEL_OUT = "heading_classifier.joblib"
+REPORT_OUT = "model_report.json"
+
+# Forest sizes / depths tried by the sweep, the old production setting is 700 x 10
+SWEEP_ESTIMATORS = [25, 50, 100, 200, 400, 700]
+SWEEP_DEPTHS = [6, 8, 10]
+
+# Also train small students on the 700 x 10 forest's labels
+DISTILL = True
+
+# Rows used to time inference, reported per line
+LATENCY_ROWS = 1000
+
+# Pick the production artifact by name from the report (e.g. "rf-200-d10"), otherwise
+# the fastest Pareto model whose heading F1 is within F1_TOLERANCE of the best one
+SELECT_MODEL = os.environ.get("SELECT_MODEL")
+F1_TOLERANCE = 0.01
 
 
 LABEL_MAP = {
@@ -51,31 +77,161 @@ LABEL_MAP = {
 
 
 # -----------------------------
-# FEATURE EXTRACTION
+# MODEL CANDIDATES
 # -----------------------------
 
-def line_to_features(line, insights):
-    fonts = set(line["style_stats"].keys())
-    sizes = set(line["size_stats"].keys())
+def make_forest(n_estimators, max_depth):
+    return RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        min_samples_leaf=2,
+        random_state=42,
+        n_jobs=-1,
+        min_samples_split=5,
+        oob_score=True,
+        class_weight='balanced'
+    )
+
+
+def make_students():
+    return {
+        "logreg-distilled": make_pipeline(
+            StandardScaler(),
+            LogisticRegression(max_iter=1000, class_weight='balanced')
+        ),
+        "hgb-d3-distilled": HistGradientBoostingClassifier(
+            max_depth=3,
+            max_iter=100,
+            random_state=42
+        ),
+    }
+
+
+def build_artifact(model, metrics=None, model_name=None):
+    return {
+        "model": model,
+        "label_map": LABEL_MAP,
+        "feature_order": FEATURE_ORDER,
+        "model_name": model_name,
+        "metrics": metrics,
+    }
+
+
+def artifact_size(artifact):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "candidate.joblib")
+        joblib.dump(artifact, path)
+        return os.path.getsize(path)
+
+
+#Microseconds per line with the predictor classify_model would use for this model
+def model_latency(model, X_sample, repeats=5):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if isinstance(model, RandomForestClassifier):
+            forest_dir = export_forest(build_artifact(model), os.path.join(tmp_dir, "forest"))
+            predict = FlatForest.load(forest_dir).predict
+        else:
+            predict = model.predict
+
+        X_sample = np.asarray(X_sample, dtype=np.float32)
+        predict(X_sample)
+
+        best = float("inf")
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            predict(X_sample)
+            best = min(best, time.perf_counter() - start_time)
+
+    return best / len(X_sample) * 1e6
+
+
+def evaluate(name, model, X_test, y_test, X_sample, distilled=False):
+    return {
+        "name": name,
+        "model": model,
+        "heading_f1": f1_score(y_test, model.predict(X_test), pos_label=LABEL_MAP["HEADING"]),
+        "latency_us": model_latency(model, X_sample),
+        "size_kb": artifact_size(build_artifact(model)) / 1024,
+        "distilled": distilled,
+    }
+
+
+#Fit every forest in the sweep plus the distilled students, evaluated on the same split
+def sweep_models(X_train, y_train, X_test, y_test):
+    rng = np.random.default_rng(42)
+    X_all = np.concatenate([X_train, X_test])
+    X_sample = X_all[rng.integers(0, len(X_all), LATENCY_ROWS)]
+
+    results = []
+    teacher = None
+
+    for max_depth in SWEEP_DEPTHS:
+        for n_estimators in SWEEP_ESTIMATORS:
+            name = f"rf-{n_estimators}-d{max_depth}"
+            print(f"    Training {name}")
+
+            model = make_forest(n_estimators, max_depth)
+            model.fit(X_train, y_train)
+            results.append(evaluate(name, model, X_test, y_test, X_sample))
+
+            if (n_estimators, max_depth) == (700, 10):
+                teacher = model
+
+    if DISTILL:
+        if teacher is None:
+            teacher = make_forest(700, 10).fit(X_train, y_train)
+
+        # students learn the forest's decisions, not the noisier weak labels
+        y_teacher = teacher.predict(X_train)
+
+        for name, model in make_students().items():
+            print(f"    Training {name}")
+            model.fit(X_train, y_teacher)
+            results.append(evaluate(name, model, X_test, y_test, X_sample, distilled=True))
+
+    return results
+
+
+#Candidates no other one beats on F1, latency and size at once
+def pareto_front(results):
+    front = []
+
+    for r in results:
+        dominated = any(
+            o["heading_f1"] >= r["heading_f1"]
+            and o["latency_us"] <= r["latency_us"]
+            and o["size_kb"] <= r["size_kb"]
+            and (o["heading_f1"], o["latency_us"], o["size_kb"]) != (r["heading_f1"], r["latency_us"], r["size_kb"])
+            for o in results
+        )
+        if not dominated:
+            front.append(r["name"])
+
+    return front
+
+
+def select_model(results, front):
+    if SELECT_MODEL:
+        for r in results:
+            if r["name"] == SELECT_MODEL:
+                return r
+        raise ValueError(f"SELECT_MODEL={SELECT_MODEL} is not in the sweep")
+
+    best_f1 = max(r["heading_f1"] for r in results)
+    candidates = [
+        r for r in results
+        if r["name"] in front and r["heading_f1"] >= best_f1 - F1_TOLERANCE
+    ]
+    return min(candidates, key=lambda r: r["latency_us"])
 
-    features = [
-        line["word_count"],
-        int(line["has_symbol"]),
-        int(line["starts_with_number"]),
-        int(line["ends_with_punctuation"]),
-        int(insights.get("paragraph_font") in fonts),
-        int(insights.get("heading_size") in sizes if insights.get("heading_size") else 0),
-        round(line["layout"]["top"] / 800, 3),  # normalized vertical position
 
-        line.get("is_tiny", 0),
-        line.get("is_numeric_only", 0),
-        round(line.get("alpha_ratio", 0), 3),
-        round(line.get("digit_ratio", 0), 3),
-        round(line.get("symbol_ratio", 0), 3),
-        line.get("has_math_symbol", 0),
-    ]
+def print_pareto_report(results, front, selected):
+    print("\nModel sweep (* = Pareto front, > = selected):")
+    print(f"      {'model':<18} {'heading F1':>10} {'us/line':>9} {'size KB':>9}")
 
-    return features
+    for r in sorted(results, key=lambda r: r["latency_us"]):
+        mark = (">" if r is selected else " ") + ("*" if r["name"] in front else " ")
+        print(f"  {mark}  {r['name']:<18} {r['heading_f1']:>10.4f} {r['latency_us']:>9.2f} {r['size_kb']:>9.1f}")
 
 
 # -----------------------------
@@ -90,7 +246,7 @@ with open(LABELS_PATH, "r", encoding="utf-8") as f:
 # BUILD DATASET
 # -----------------------------
 
-X = []
+X_parts = []
 y = []
 
 print("[+] Building dataset...")
@@ -100,11 +256,15 @@ for pdf_path in PDF_PATHS:
     print(f"    Processing {pdf_name}")
 
     lines = extract_document_lines(pdf_path)
-    insights = main_ex(lines)
+    insights = DocumentProfile.from_lines(lines).as_insights()
 
     pdf_labels = ALL_LABELS.get(pdf_name, {})
 
-    for line in lines:
+    # same float32 features classify_model builds at serving time
+    features = build_feature_matrix(lines, insights)
+    labeled_rows = []
+
+    for row, line in enumerate(lines):
         key = f"{line['page_index']}_{line['line_index']}"
 
         if key not in pdf_labels:
@@ -116,9 +276,14 @@ for pdf_path in PDF_PATHS:
         if label_str not in LABEL_MAP:
             continue
 
-        X.append(line_to_features(line, insights))
+        labeled_rows.append(row)
         y.append(LABEL_MAP[label_str])
 
+    X_parts.append(features[labeled_rows])
+
+X = np.concatenate(X_parts)
+y = np.asarray(y)
+
 print(f"[✓] Total labeled samples: {len(y)}")
 
 if len(y) < 100:
@@ -139,23 +304,27 @@ X_train, X_test, y_train, y_test = train_test_split(
 
 
 # -----------------------------
-# TRAIN MODEL
+# SWEEP + SELECT MODEL
 # -----------------------------
 
-print("[+] Training model...")
+print("[+] Sweeping models...")
 
-model = RandomForestClassifier(
-    n_estimators=700,
-    max_depth=10,
-    min_samples_leaf=2,
-    random_state=42,
-    n_jobs=-1,
-    min_samples_split=5,
-    oob_score=True,
-    class_weight='balanced'
-)
+results = sweep_models(X_train, y_train, X_test, y_test)
+front = pareto_front(results)
+selected = select_model(results, front)
+
+print_pareto_report(results, front, selected)
+
+with open(REPORT_OUT, "w", encoding="utf-8") as f:
+    json.dump({
+        "selected": selected["name"],
+        "pareto_front": front,
+        "candidates": [{k: v for k, v in r.items() if k != "model"} for r in results]
+    }, f, indent=2)
+
+print(f"\n[✓] Sweep report saved as {REPORT_OUT}")
 
-model.fit(X_train, y_train)
+model = selected["model"]
 
 
 # -----------------------------
@@ -164,6 +333,8 @@ model.fit(X_train, y_train)
 
 y_pred = model.predict(X_test)
 
+print(f"\nSelected model: {selected['name']}")
+
 print("\nConfusion Matrix (SANITY CHECK):")
 print(confusion_matrix(y_test, y_pred))
 
@@ -175,25 +346,11 @@ print(classification_report(y_test, y_pred, target_names=["PARAGRAPH", "HEADING"
 # SAVE MODEL + METADATA
 # -----------------------------
 
-artifact = {
-    "model": model,
-    "label_map": LABEL_MAP,
-    "feature_order": [
-        "word_count",
-        "has_symbol",
-        "starts_with_number",
-        "ends_with_punctuation",
-        "is_paragraph_font",
-        "is_heading_size",
-        "normalized_top",
-        "is_tiny",
-        "is_numeric_only",
-        "alpha_ratio",
-        "digit_ratio",
-        "symbol_ratio",
-        "has_math_symbol"
-    ]
-}
+artifact = build_artifact(
+    model,
+    metrics={k: v for k, v in selected.items() if k not in ("model", "name")},
+    model_name=selected["name"]
+)
 
 joblib.dump(artifact, MODEL_OUT)
 
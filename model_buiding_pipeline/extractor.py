@@ -3,12 +3,15 @@ from docx import Document
 import re
 import os
 
-from wordsegment import load, segment
 import re
 
-load()
+from rag_engine.converters.extract_classify.segment_cache import segment_cache, cached_segment
+from rag_engine.converters.extract_classify.glue_check import chunk_needs_segmentation, well_formed_pages
 
 def repair_sentence(all_lines):
+    # pages that already look like normal prose skip most segmentation
+    page_well_formed = well_formed_pages(all_lines)
+
     for line in all_lines:
         text = line["text"]
         text = re.sub(r'\(cid:\d+\)', ' ', text)
@@ -28,10 +31,14 @@ def repair_sentence(all_lines):
             
             repaired_chunks = []
             for chunk in chunks:
-                # If the chunk is purely alphabetic and long, segment it
-                if chunk.isalpha() and len(chunk) > 3:
+                # If the chunk is purely alphabetic, long and looks glued, segment it
+                if (
+                    chunk.isalpha()
+                    and len(chunk) > 3
+                    and chunk_needs_segmentation(chunk, page_well_formed[line["page_index"]])
+                ):
                     # segment() returns a list of words
-                    split_words = segment(chunk)
+                    split_words = cached_segment(chunk)
                     
                     # Heuristic: If segmenting didn't change anything, keep original casing
                     # Otherwise, use the segmented version
@@ -73,6 +80,8 @@ def repair_sentence(all_lines):
         # Contains math symbols
         line["has_math_symbol"] = 1 if math_symbol_count > 0 else 0
 
+    segment_cache.flush()
+
     return all_lines
 
 # ==========================================================
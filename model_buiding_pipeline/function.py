@@ -2,11 +2,12 @@
 It loads the weak labels from a JSON file and prints each line along with its assigned label.
 it helps to check the weak label json and pdf pdf line by line heading with line... help to edit the json to make it good one.
 
-this help to make model training good'''
+this help to make model training good
+
+Run from the repo root: python -m model_buiding_pipeline.function'''
 import json
 import os
-from insights import main_ex
-from extractor import extract_document_lines
+from model_buiding_pipeline.extractor import extract_document_lines
 
 # -----------------------------
 # CONFIG
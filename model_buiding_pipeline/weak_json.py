@@ -12,13 +12,15 @@ Philosophy:
 
 This generates SILVER labels.
 DO NOT use for evaluation.
+
+Run from the repo root: python -m model_buiding_pipeline.weak_json
 """
 
 import json
 import os
 from statistics import median
-from insights import main_ex
-from extractor import extract_document_lines
+from model_buiding_pipeline.extractor import extract_document_lines
+from rag_engine.converters.extract_classify.insights import DocumentProfile
 
 
 # ------------------------------
@@ -100,7 +102,7 @@ def generate_weak_labels(pdf_paths, output_path="weak_labels_final.json"):
         print(f"[+] Processing {pdf_name}")
 
         lines = extract_document_lines(pdf_path)
-        insights = main_ex(pdf_path)
+        insights = DocumentProfile.from_lines(lines).as_insights()
 
         pdf_labels = {}
 
@@ -0,0 +1,300 @@
+import json
+import os
+import re
+
+# Embedding model of the vector db (sentence-transformers name or local directory),
+# its tokenizer decides how long a chunk may be
+MODEL_NAME = os.environ.get("EMBED_MODEL", "all-MiniLM-L6-v2")
+
+# Model input window in word-pieces, special tokens included. 0 = read it from the model:
+# its sentence-transformers max_seq_length (all-MiniLM-L6-v2 truncates at 256 while its
+# tokenizer allows 512), else the tokenizer's model_max_length
+MAX_SEQ_LENGTH = int(os.environ.get("EMBED_MAX_SEQ_LENGTH", "0"))
+
+# window when neither can be loaded (ApproximateTokenizer), all-MiniLM-L6-v2's
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+# Hub id or local directory of the model, the way sentence-transformers resolves a bare name
+MODEL_REPO = MODEL_NAME if os.path.isdir(MODEL_NAME) or "/" in MODEL_NAME else f"sentence-transformers/{MODEL_NAME}"
+
+# Hub id (or local directory) of that model's tokenizer
+TOKENIZER_NAME = os.environ.get("CHUNK_TOKENIZER", MODEL_REPO)
+
+# word-pieces repeated from the end of one chunk at the start of the next
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", "32"))
+
+# headings longer than this are cut in the embedded prefix so the content keeps most of the window
+MAX_HEADING_TOKENS = 32
+
+# text that is actually embedded for a chunk
+CHUNK_TEMPLATE = "Section: {heading}\nContent: {content}"
+
+# a word ending a sentence: . ! or ? optionally followed by closing quotes/brackets
+SENTENCE_END = re.compile(r"[.!?][\"'”’)\]]*$")
+
+# Fallback tokenizer: characters of a letter/digit run per word-piece, low so chunks
+# err on the short side (the model's own vocabulary averages about 5 per piece)
+APPROX_CHARS_PER_PIECE = 4
+
+tokenizer = None
+max_seq_length = None
+
+
+#Load the embedding model's tokenizer on first use, or ApproximateTokenizer when it
+#can't be loaded (offline and not cached, or transformers missing)
+def get_tokenizer():
+    global tokenizer
+
+    if tokenizer is None:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+        except (OSError, ImportError, ValueError) as e:
+            reason = str(e).splitlines()[0] if str(e) else type(e).__name__
+            print(f"Warning: tokenizer {TOKENIZER_NAME} could not be loaded ({reason}), chunking with approximate word-piece counts")
+            tokenizer = ApproximateTokenizer()
+
+    return tokenizer
+
+
+#Input window of the embedding model, resolved once (see MAX_SEQ_LENGTH)
+def get_max_seq_length():
+    global max_seq_length
+
+    if max_seq_length is None:
+        max_seq_length = MAX_SEQ_LENGTH or model_max_seq_length()
+
+    return max_seq_length
+
+
+def model_max_seq_length():
+    config = sentence_transformers_config()
+    if config and config.get("max_seq_length"):
+        return int(config["max_seq_length"])
+
+    # tokenizers without a limit report a huge sentinel, ApproximateTokenizer has none at all
+    limit = getattr(get_tokenizer(), "model_max_length", None)
+    if limit and limit < 100000:
+        return int(limit)
+
+    print(f"Warning: input window of {MODEL_NAME} unknown, chunking for {DEFAULT_MAX_SEQ_LENGTH} tokens (set EMBED_MAX_SEQ_LENGTH)")
+    return DEFAULT_MAX_SEQ_LENGTH
+
+
+#sentence_bert_config.json of the model, None when it isn't a sentence-transformers model
+#or can't be loaded (offline and not cached)
+def sentence_transformers_config():
+    try:
+        if os.path.isdir(MODEL_REPO):
+            path = os.path.join(MODEL_REPO, "sentence_bert_config.json")
+        else:
+            from huggingface_hub import hf_hub_download
+            path = hf_hub_download(MODEL_REPO, "sentence_bert_config.json")
+
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ImportError, ValueError):
+        return None
+
+
+#Word-piece estimate in the shape of the transformers tokenizer calls used here: BERT's
+#pre-tokenization (letter/digit runs, one piece per punctuation mark), then every run
+#counts one piece per APPROX_CHARS_PER_PIECE characters
+class ApproximateTokenizer:
+
+    PRE_TOKEN = re.compile(r"[^\W_]+|[^\w\s]|_")
+
+    def pieces(self, text):
+        offsets = []
+        for match in self.PRE_TOKEN.finditer(text):
+            for start in range(match.start(), match.end(), APPROX_CHARS_PER_PIECE):
+                offsets.append((start, min(start + APPROX_CHARS_PER_PIECE, match.end())))
+        return offsets
+
+    def num_special_tokens_to_add(self):
+        # [CLS] and [SEP]
+        return 2
+
+    def __call__(self, text, add_special_tokens=True, return_offsets_mapping=False):
+        texts = [text] if isinstance(text, str) else text
+        special = self.num_special_tokens_to_add() if add_special_tokens else 0
+
+        offsets = [self.pieces(t) for t in texts]
+        encoded = {"input_ids": [[0] * (len(o) + special) for o in offsets]}
+        if return_offsets_mapping:
+            encoded["offset_mapping"] = offsets
+
+        if isinstance(text, str):
+            return {key: value[0] for key, value in encoded.items()}
+        return encoded
+
+
+#Word-pieces per word, the tokenizer splits on whitespace first so a text's
+#count is the sum of its words' counts
+def word_token_counts(words):
+    unique = list(dict.fromkeys(words))
+    if not unique:
+        return []
+
+    encoded = get_tokenizer()(unique, add_special_tokens=False)["input_ids"]
+    counts = {word: len(ids) for word, ids in zip(unique, encoded)}
+    return [counts[word] for word in words]
+
+
+def count_tokens(text, special_tokens=True):
+    tokens = len(get_tokenizer()(text, add_special_tokens=False)["input_ids"])
+    return tokens + get_tokenizer().num_special_tokens_to_add() if special_tokens else tokens
+
+
+#Cut a word of more than max_tokens word-pieces into parts of at most max_tokens, cut at
+#piece boundaries. A part is re-tokenized on its own, so parts that come out longer get cut finer
+def split_long_word(word, max_tokens):
+    offsets = get_tokenizer()(word, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    step = max_tokens
+
+    while True:
+        cuts = [offsets[i][0] for i in range(step, len(offsets), step)]
+        parts = [word[start:end] for start, end in zip([0] + cuts, cuts + [len(word)])]
+
+        counts = word_token_counts(parts)
+        if step == 1 or max(counts) <= max_tokens:
+            return parts, counts
+        step = max(1, step * max_tokens // max(counts) - 1)
+
+
+def truncate_words(words, counts, max_tokens):
+    total = 0
+    for i, count in enumerate(counts):
+        total += count
+        if total > max_tokens:
+            return words[:i]
+    return words
+
+
+def format_chunk(heading, content):
+    words = heading.split()
+    heading = " ".join(truncate_words(words, word_token_counts(words), MAX_HEADING_TOKENS))
+    return CHUNK_TEMPLATE.format(heading=heading, content=content)
+
+
+#Sentences as lists of word indices, a sentence over max_tokens is cut into word runs that fit
+def sentence_units(words, counts, max_tokens):
+    units = []
+    current = []
+    current_tokens = 0
+
+    for i, word in enumerate(words):
+        if current and current_tokens + counts[i] > max_tokens:
+            units.append(current)
+            current, current_tokens = [], 0
+
+        current.append(i)
+        current_tokens += counts[i]
+
+        if SENTENCE_END.search(word):
+            units.append(current)
+            current, current_tokens = [], 0
+
+    if current:
+        units.append(current)
+
+    return units
+
+
+#Split text into chunks whose embedded form (template + heading + content) fits the model
+#window: whole sentences are packed while they fit, and every chunk after the first
+#starts with up to `overlap` word-pieces from the end of the previous one
+def chunk_text(text, heading, max_seq_length=None, overlap=CHUNK_OVERLAP):
+    max_seq_length = max_seq_length or get_max_seq_length()
+    words = text.split()
+    if not words:
+        return []
+
+    counts = word_token_counts(words)
+
+    prefix_tokens = count_tokens(format_chunk(heading, ""))
+    budget = max_seq_length - prefix_tokens
+    if budget <= 0:
+        raise ValueError(f"Chunk prefix for heading {heading!r} leaves no room in a {max_seq_length} token window")
+
+    # a single word over the budget (e.g. a long url) is hard-split into runs of word-pieces that fit
+    if max(counts) > budget:
+        split_words, split_counts = [], []
+        for word, count in zip(words, counts):
+            if count > budget:
+                parts, part_counts = split_long_word(word, budget)
+                split_words.extend(parts)
+                split_counts.extend(part_counts)
+            else:
+                split_words.append(word)
+                split_counts.append(count)
+        words, counts = split_words, split_counts
+
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for unit in sentence_units(words, counts, budget):
+        unit_tokens = sum(counts[i] for i in unit)
+
+        if current and current_tokens + unit_tokens > budget:
+            chunks.append(current)
+
+            # carry the tail of the chunk over, as much of it as still leaves room for the unit
+            tail_budget = min(overlap, budget - unit_tokens)
+            tail = []
+            tail_tokens = 0
+            for i in reversed(current):
+                if tail_tokens + counts[i] > tail_budget:
+                    break
+                tail.insert(0, i)
+                tail_tokens += counts[i]
+
+            current, current_tokens = tail, tail_tokens
+
+        current.extend(unit)
+        current_tokens += unit_tokens
+
+    chunks.append(current)
+
+    # every chunk is a run of word indices [start, end). Word-piece counts only add up for
+    # whitespace-splitting tokenizers, so a chunk still over the window gives up its last
+    # words, and the next chunk starts early enough to pick them up
+    contents = []
+    covered = 0
+    spans = [(chunk[0], chunk[-1] + 1) for chunk in chunks]
+    i = 0
+
+    while i < len(spans) or covered < len(words):
+        if i < len(spans):
+            start, end = spans[i]
+            start = min(start, covered)
+            i += 1
+        else:
+            start, end = covered, len(words)
+
+        while end - start > 1 and count_tokens(format_chunk(heading, " ".join(words[start:end]))) > max_seq_length:
+            end -= 1
+
+        contents.append(" ".join(words[start:end]))
+        covered = max(covered, end)
+
+    return contents
+
+
+#Tokens the model never sees, over every embedded chunk of the given sections
+def truncation_stats(sections, max_seq_length=None):
+    max_seq_length = max_seq_length or get_max_seq_length()
+    stats = {"chunks": 0, "truncated_chunks": 0, "tokens": 0, "truncated_tokens": 0}
+
+    for section in sections:
+        for chunk in section["chunks"]:
+            tokens = count_tokens(format_chunk(section["heading"], chunk["content"]))
+            lost = max(0, tokens - max_seq_length)
+
+            stats["chunks"] += 1
+            stats["tokens"] += tokens
+            stats["truncated_chunks"] += lost > 0
+            stats["truncated_tokens"] += lost
+
+    return stats
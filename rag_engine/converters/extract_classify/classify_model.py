@@ -1,64 +1,317 @@
-import joblib
-from .insights import main_ex
-from .extractor import extract_document_lines
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
-MODEL_PATH = "heading_classifier.joblib"
+import numpy as np
+
+from .insights import DocumentProfile, document_profile
+from .extractor import extract_document_lines, iter_document_lines, extraction_variant, EXTRACT_WORKERS
+from .doc_cache import ROOT_DIR, load_cached, store_cached, classification_version, load_cached_profile, store_cached_profile
+from .forest import FlatForest, load_flat_forest
+from .line_table import LineTable
+from .features import FEATURE_ORDER, build_feature_matrix, validate_feature_order, line_to_features
+
+# resolved from the repo root so classification works from any working directory
+MODEL_PATH = os.environ.get("HEADING_MODEL_PATH", os.path.join(ROOT_DIR, "heading_classifier.joblib"))
 PDF_PATH = "test.pdf"   # change this to the PDF you want to test
 
+# "flat" predicts from memory-mapped tree arrays (see forest.py), "sklearn" unpickles the forest
+CLASSIFIER_ENGINE = os.environ.get("CLASSIFIER_ENGINE", "flat")
+
+# "model" sends every line through the classifier, "hybrid" labels the lines the weak-label
+# rules are sure about as PARAGRAPH and only asks the model about the rest
+CLASSIFIER_MODE = os.environ.get("CLASSIFIER_MODE", "model")
+
+# hybrid mode flags model predictions under this probability with needs_review
+REVIEW_THRESHOLD = float(os.environ.get("REVIEW_THRESHOLD", "0.7"))
+
+# Streaming mode profiles the document (paragraph font, heading size) on its first pages only
+PROFILE_PAGES = 3
+
 # LOAD MODEL
 
-artifact = joblib.load(MODEL_PATH)
-model = artifact["model"]
-label_map = artifact["label_map"]
-inv_label_map = {v: k for k, v in label_map.items()}
+model = None
+inv_label_map = None
+
+
+#Load the classifier on first use instead of at import
+def get_model():
+    global model, inv_label_map
+
+    if model is None:
+        if CLASSIFIER_ENGINE == "flat":
+            # a FlatForest, or the already unpickled artifact when the model isn't a forest
+            artifact = load_flat_forest(MODEL_PATH)
+        else:
+            import joblib
+            artifact = joblib.load(MODEL_PATH)
+
+        if isinstance(artifact, FlatForest):
+            loaded = artifact
+            label_map = loaded.label_map
+            feature_order = loaded.feature_order
+        else:
+            loaded = artifact["model"]
+            label_map = artifact["label_map"]
+            feature_order = artifact.get("feature_order")
+
+        # serving builds features from features.FEATURE_ORDER, refuse a model trained on another schema
+        validate_feature_order(feature_order)
+
+        model = loaded
+        inv_label_map = {v: k for k, v in label_map.items()}
+
+    return model, inv_label_map
 
 # FEATURE EXTRACTION
 
-def line_to_features(line, insights):
-    fonts = set(line["style_stats"].keys())
-    sizes = set(line["size_stats"].keys())
-
-    return [
-        line["word_count"],
-        int(line["has_symbol"]),
-        int(line["starts_with_number"]),
-        int(line["ends_with_punctuation"]),
-        int(insights.get("paragraph_font") in fonts),
-        int(insights.get("heading_size") in sizes if insights.get("heading_size") else 0),
-        round(line["layout"]["top"] / 800, 3),
-
-        line.get("is_tiny", 0),
-        line.get("is_numeric_only", 0),
-        round(line.get("alpha_ratio", 0), 3),
-        round(line.get("digit_ratio", 0), 3),
-        round(line.get("symbol_ratio", 0), 3),
-        line.get("has_math_symbol", 0),
-    ]
+def feature_matrix(lines, insights):
+    return build_feature_matrix(lines, insights)
+
+
+#Rows weak_json.is_paragraph's first two rules call PARAGRAPH no matter the layout:
+#12+ words, or 8+ words ending in punctuation. Rule 3 depends on the paragraph size,
+#which isn't a feature, so those lines still go to the model
+def rule_paragraph_mask(f_matrix):
+    word_count = f_matrix[:, FEATURE_ORDER.index("word_count")]
+    ends_with_punctuation = f_matrix[:, FEATURE_ORDER.index("ends_with_punctuation")] > 0
+    return (word_count >= 12) | ((word_count >= 8) & ends_with_punctuation)
+
+
+#Label ids for a feature matrix, plus the needs_review flags in hybrid mode (None otherwise)
+def predict_labels(f_matrix, mode=None):
+    mode = mode or CLASSIFIER_MODE
+    model, inv_label_map = get_model()
+
+    if mode == "model":
+        return model.predict(f_matrix), None
+    if mode != "hybrid":
+        raise ValueError(f"Unknown classifier mode: {mode}")
+
+    label_map = {v: k for k, v in inv_label_map.items()}
+    pred = np.full(len(f_matrix), label_map["PARAGRAPH"])
+    needs_review = np.zeros(len(f_matrix), dtype=bool)
+
+    ambiguous = np.flatnonzero(~rule_paragraph_mask(f_matrix))
+    if len(ambiguous):
+        proba = model.predict_proba(f_matrix[ambiguous])
+        classes = model.classes if hasattr(model, "classes") else model.classes_
+        pred[ambiguous] = classes.take(np.argmax(proba, axis=1))
+        needs_review[ambiguous] = proba.max(axis=1) < REVIEW_THRESHOLD
+
+    return pred, needs_review
+
+
+#Cache tag of classified output, hybrid results are a variant of their own next to pure model ones
+def result_version(variant, mode=None):
+    mode = mode or CLASSIFIER_MODE
+    if mode != "model":
+        variant = f"{variant}-{mode}-{REVIEW_THRESHOLD}"
+    return classification_version(variant, MODEL_PATH)
 
 
 # RUN TEST
 
-def classify_pdf(pdf_path):
-    lines = extract_document_lines(pdf_path)
-    insights = main_ex(lines)
-    f_matrix = [line_to_features(line, insights) for line in lines]
-    pred = model.predict(f_matrix)
+def classify_lines(lines, insights, mode=None):
+    f_matrix = feature_matrix(lines, insights)
+    if not len(f_matrix):
+        return []
+
+    return label_lines(lines, *predict_labels(f_matrix, mode))
 
+
+#page_index, line_index and text of every line, straight from the columns of a LineTable
+def line_fields(lines):
+    if isinstance(lines, LineTable):
+        return zip(lines.columns["page_index"].tolist(), lines.columns["line_index"].tolist(), lines.texts)
+    return ((line["page_index"], line["line_index"], line["text"]) for line in lines)
+
+
+def label_lines(lines, pred, needs_review=None):
+    _, inv_label_map = get_model()
     structured_output = []
 
-    for i, line in enumerate(lines):
+    for i, (page_index, line_index, text) in enumerate(line_fields(lines)):
         
         label = inv_label_map[pred[i]]
 
-        structured_output.append({
-            "page_index": line["page_index"],
-            "line_index": line["line_index"],
+        item = {
+            "page_index": page_index,
+            "line_index": line_index,
             "label": label,
-            "text": line["text"]
-        })
+            "text": text
+        }
+        if needs_review is not None:
+            item["needs_review"] = bool(needs_review[i])
+
+        structured_output.append(item)
 
     return structured_output
 
+
+def classify_pdf(pdf_path, use_cache=True, backend=None, mode=None):
+    variant = extraction_variant(backend, pdf_path)
+
+    if use_cache:
+        version = result_version(variant, mode)
+        cached = load_cached(pdf_path, "classified", version)
+        if cached is not None:
+            return cached
+
+    # profile, features and labels all read the packed columns, the line dicts are dropped here.
+    # Spilled lines (LOW_MEMORY) stream back in one at a time, but the columns and the feature
+    # matrix still cover the whole document: the RSS ceiling bounds extraction, not classification
+    lines = LineTable.from_lines(extract_document_lines(pdf_path, use_cache=use_cache, backend=backend))
+    insights = document_profile(pdf_path, lines, variant, use_cache=use_cache).as_insights()
+    structured_output = classify_lines(lines, insights, mode)
+
+    if use_cache:
+        store_cached(pdf_path, "classified", version, structured_output)
+
+    return structured_output
+
+
+#Extraction step of classify_pdfs, runs in a worker process and sends back a LineTable:
+#a handful of arrays cross the process boundary much faster than one dict per line
+def extract_for_classify(pdf_path, use_cache, backend):
+    return LineTable.from_lines(extract_document_lines(pdf_path, workers=1, use_cache=use_cache, backend=backend))
+
+
+#classify_pdf for many documents: extraction runs concurrently, features are still built
+#against each document's own profile, and the model sees one stacked matrix
+def classify_pdfs(pdf_paths, workers=None, use_cache=True, backend=None, mode=None):
+    workers = workers or EXTRACT_WORKERS
+    results = {}
+    pending = []
+
+    for pdf_path in pdf_paths:
+        if use_cache:
+            cached = load_cached(pdf_path, "classified", result_version(extraction_variant(backend, pdf_path), mode))
+            if cached is not None:
+                results[pdf_path] = cached
+                continue
+        if pdf_path not in pending:
+            pending.append(pdf_path)
+
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            all_lines = list(pool.map(
+                extract_for_classify,
+                pending,
+                [use_cache] * len(pending),
+                [backend] * len(pending)
+            ))
+    else:
+        all_lines = [extract_for_classify(pdf_path, use_cache, backend) for pdf_path in pending]
+
+    matrices = []
+    for pdf_path, lines in zip(pending, all_lines):
+        variant = extraction_variant(backend, pdf_path)
+        insights = document_profile(pdf_path, lines, variant, use_cache=use_cache).as_insights()
+        matrices.append(feature_matrix(lines, insights))
+
+    if pending:
+        stacked = np.concatenate(matrices)
+        if len(stacked):
+            pred, needs_review = predict_labels(stacked, mode)
+        else:
+            pred, needs_review = np.empty(0, dtype=int), None
+
+        # split the labels back at each document's row offset
+        offsets = np.cumsum([0] + [len(m) for m in matrices])
+        for i, (pdf_path, lines) in enumerate(zip(pending, all_lines)):
+            rows = slice(offsets[i], offsets[i + 1])
+            structured_output = label_lines(lines, pred[rows], None if needs_review is None else needs_review[rows])
+            results[pdf_path] = structured_output
+
+            if use_cache:
+                version = result_version(extraction_variant(backend, pdf_path), mode)
+                store_cached(pdf_path, "classified", version, structured_output)
+
+    return [results[pdf_path] for pdf_path in pdf_paths]
+
+
+#Yield classified lines page by page so memory stays around one page
+def iter_classify_pdf(pdf_path, profile_pages=PROFILE_PAGES, use_cache=True, mode=None):
+    variant = extraction_variant(file_path=pdf_path)
+    pages = iter_document_lines(pdf_path)
+
+    # a whole-document profile from an earlier run gives the same labels as classify_pdf
+    cached = load_cached_profile(pdf_path, variant) if use_cache else None
+
+    if cached is not None:
+        insights = DocumentProfile.from_dict(cached).as_insights()
+        warmup_pages = []
+    else:
+        # otherwise take the profile from the first pages and keep it fixed
+        warmup_pages = list(islice(pages, profile_pages))
+        insights = DocumentProfile().add_lines(
+            line for page_lines in warmup_pages for line in page_lines
+        ).as_insights()
+
+    # still profile every page as it streams by, so the next run has the full profile
+    full_profile = DocumentProfile()
+
+    # pop the warm-up pages as they are classified so they don't stay alive
+    def remaining_pages():
+        while warmup_pages:
+            yield warmup_pages.pop(0)
+        yield from pages
+
+    for page_lines in remaining_pages():
+        full_profile.add_lines(page_lines)
+        if page_lines:
+            yield classify_lines(page_lines, insights, mode)
+
+    if use_cache and cached is None and full_profile.line_count:
+        store_cached_profile(pdf_path, variant, full_profile.to_dict())
+
+
+#Hybrid against pure-model classification on already extracted documents: share of lines
+#the rules settle, classification time of both modes and how often their labels agree
+def compare_modes(pdf_paths, repeats=3):
+    import time
+
+    documents = []
+    for pdf_path in pdf_paths:
+        lines = extract_document_lines(pdf_path)
+        insights = document_profile(pdf_path, lines, extraction_variant(file_path=pdf_path)).as_insights()
+        documents.append((lines, insights))
+
+    get_model()
+    timings = {}
+    labels = {}
+
+    for mode in ("model", "hybrid"):
+        best = float("inf")
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            labels[mode] = [classify_lines(lines, insights, mode) for lines, insights in documents]
+            best = min(best, time.perf_counter() - start_time)
+        timings[mode] = best
+
+    f_matrix = np.concatenate([feature_matrix(lines, insights) for lines, insights in documents])
+    bypassed = int(rule_paragraph_mask(f_matrix).sum())
+
+    pairs = [
+        (a["label"], b["label"], b["needs_review"])
+        for model_doc, hybrid_doc in zip(labels["model"], labels["hybrid"])
+        for a, b in zip(model_doc, hybrid_doc)
+    ]
+    total = len(pairs)
+    agree = sum(a == b for a, b, _ in pairs)
+    review = sum(flag for _, _, flag in pairs)
+
+    print(f"{len(documents)} documents, {total} lines")
+    print(f"Rule bypass: {bypassed}/{total} lines ({bypassed / max(total, 1):.1%}) skip the model")
+    for mode, elapsed in timings.items():
+        print(f"{mode:<7} {elapsed * 1000:.1f} ms")
+    print(f"Speedup: {timings['model'] / timings['hybrid']:.2f}x")
+    print(f"Agreement with model labels: {agree}/{total} ({agree / max(total, 1):.2%})")
+    print(f"Flagged for review (p < {REVIEW_THRESHOLD}): {review}")
+
+    return {"bypassed": bypassed, "total": total, "timings": timings, "agree": agree, "review": review}
+
 # Example usage in case to test the classify_pdf function directly without running the whole server
 #remove the triple quotes to run this test
 '''
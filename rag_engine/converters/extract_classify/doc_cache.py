@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+# One gzipped JSON file per (document hash, kind, version) under CACHE_DIR. A version reads
+# "<variant>@<stamp>": variants (line engine, backend, classifier mode) live side by side,
+# the stamp (code versions, model hash) replaces older entries of the same variant
+CACHE_DIR = os.environ.get("DOC_CACHE_DIR", os.path.join(ROOT_DIR, ".cache", "documents"))
+
+# Bump these when extraction / classification output changes, stale entries are then ignored
+EXTRACTOR_VERSION = "2"
+CLASSIFIER_VERSION = "1"
+
+_sha_memo = {}
+
+
+def file_sha256(file_path):
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+    if memo_key not in _sha_memo:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _sha_memo[memo_key] = digest.hexdigest()
+
+    return _sha_memo[memo_key]
+
+
+def cache_file(sha, kind, version):
+    return os.path.join(CACHE_DIR, f"{sha}.{kind}.{version}.json.gz")
+
+
+# size_stats has float keys, JSON would turn them into strings
+def encode_lines(lines):
+    encoded = []
+    for line in lines:
+        line = dict(line)
+        line["size_stats"] = list(line["size_stats"].items())
+        encoded.append(line)
+    return encoded
+
+
+def decode_lines(lines):
+    for line in lines:
+        line["size_stats"] = {size: count for size, count in line["size_stats"]}
+    return lines
+
+
+def load_cached(file_path, kind, version):
+    path = cache_file(file_sha256(file_path), kind, version)
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # truncated or corrupt entry, treat as a miss
+        return None
+
+
+def store_cached(file_path, kind, version, data):
+    sha = file_sha256(file_path)
+    path = cache_file(sha, kind, version)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # write to a temp file and rename so readers never see a partial entry
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    # drop entries of the same variant written by older versions (and pre-variant entries)
+    prefix = f"{sha}.{kind}."
+    variant_prefix = f"{prefix}{version.split('@')[0]}@"
+    for name in os.listdir(CACHE_DIR):
+        if not name.startswith(prefix) or name == os.path.basename(path):
+            continue
+        if name.startswith(variant_prefix) or "@" not in name:
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except FileNotFoundError:
+                pass
+
+
+#variant covers extraction settings that change the output (e.g. the line engine)
+def extraction_version(variant):
+    return f"{variant}@{EXTRACTOR_VERSION}"
+
+
+def classification_version(variant, model_path):
+    # the model file's own hash is part of the tag so retraining invalidates results too
+    return f"{variant}@{EXTRACTOR_VERSION}-{CLASSIFIER_VERSION}-{file_sha256(model_path)[:12]}"
+
+
+def load_cached_lines(file_path, variant):
+    lines = load_cached(file_path, "lines", extraction_version(variant))
+    return decode_lines(lines) if lines is not None else None
+
+
+def store_cached_lines(file_path, variant, lines):
+    store_cached(file_path, "lines", extraction_version(variant), encode_lines(lines))
+
+
+#DocumentProfile.to_dict() of a document, stored next to its lines
+def load_cached_profile(file_path, variant):
+    return load_cached(file_path, "profile", extraction_version(variant))
+
+
+def store_cached_profile(file_path, variant, profile):
+    store_cached(file_path, "profile", extraction_version(variant), profile)
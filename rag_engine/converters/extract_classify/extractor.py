@@ -1,13 +1,40 @@
-import pdfplumber
 import re
+import gc
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+import numpy as np
+from docx import Document
+from docx.oxml.ns import qn
 
-from wordsegment import load, segment
 import re
 
-load()
+from .segment_cache import segment_cache, cached_segment, report_segment_stats
+from .glue_check import glue_stats, chunk_needs_segmentation, well_formed_pages, report_glue_stats
+from .line_table import LineTable
+from .doc_cache import load_cached_lines, store_cached_lines
+from .pdf_backends import PDF_BACKEND, count_pages, iter_page_words
+from .memory_guard import (
+    LOW_MEMORY, PAGE_WINDOW, RSS_CEILING_MB, ON_CEILING,
+    SpilledLines, check_ceiling, current_rss_mb, peak_rss_mb, format_mb
+)
+
+# Number of worker processes used by extract_pdf_lines (1 = serial)
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", "1"))
+
+# print pages/sec and the repair cache stats of every extract_pdf_lines call
+EXTRACT_STATS = os.environ.get("EXTRACT_STATS") == "1"
+
+# Word-to-line grouping: "loop" (extract_lines_pdf, what the weak labels were built on)
+# or "numpy" (cluster_lines_np)
+LINE_ENGINE = os.environ.get("LINE_ENGINE", "loop")
 
 def repair_sentence(all_lines):
+    # pages that already look like normal prose skip most segmentation
+    page_well_formed = well_formed_pages(all_lines)
+
     for line in all_lines:
         text = line["text"]
         text = re.sub(r'\(cid:\d+\)', ' ', text)
@@ -27,10 +54,14 @@ def repair_sentence(all_lines):
             
             repaired_chunks = []
             for chunk in chunks:
-                # If the chunk is purely alphabetic and long, segment it
-                if chunk.isalpha() and len(chunk) > 3:
+                # If the chunk is purely alphabetic, long and looks glued, segment it
+                if (
+                    chunk.isalpha()
+                    and len(chunk) > 3
+                    and chunk_needs_segmentation(chunk, page_well_formed[line["page_index"]])
+                ):
                     # segment() returns a list of words
-                    split_words = segment(chunk)
+                    split_words = cached_segment(chunk)
                     
                     # Heuristic: If segmenting didn't change anything, keep original casing
                     if len(split_words) == 1 and split_words[0].lower() == chunk.lower():
@@ -71,6 +102,8 @@ def repair_sentence(all_lines):
         # Contains math symbols
         line["has_math_symbol"] = 1 if math_symbol_count > 0 else 0
 
+    segment_cache.flush()
+
     return all_lines
 
 # COMMON HELPERS
@@ -166,26 +199,418 @@ def extract_lines_pdf(words, page_index, start_line_index, threshold=2):
     return lines, line_index
 
 
-def extract_pdf_lines(pdf_path):
-    all_lines = []
+#Vectorized line grouping over word arrays: sort words by (top, x0), start a new line
+#wherever the vertical gap to the previous word exceeds threshold, order each line by x0
+def cluster_word_arrays(tops, x0s, x1s, texts, fonts, sizes, page_index, start_line_index, threshold=2):
+    if len(tops) == 0:
+        return [], start_line_index
+
+    by_top = np.lexsort((x0s, tops))
+    line_ids = np.empty(len(tops), dtype=np.int64)
+    line_ids[by_top] = np.concatenate(([0], np.cumsum(np.diff(tops[by_top]) > threshold)))
+
+    # reading order: line first, then left to right inside the line
+    order = np.lexsort((x0s, line_ids))
+    bounds = np.flatnonzero(np.diff(line_ids[order])) + 1
+    starts = np.concatenate(([0], bounds)).tolist()
+    ends = np.concatenate((bounds, [len(order)])).tolist()
+
+    line_tops = np.minimum.reduceat(tops[order], starts).tolist()
+    line_x0s = np.minimum.reduceat(x0s[order], starts).tolist()
+    line_x1s = np.maximum.reduceat(x1s[order], starts).tolist()
+
+    order = order.tolist()
+    texts = [texts[i] for i in order]
+    fonts = [fonts[i] for i in order]
+    sizes = [sizes[i] for i in order]
+
+    lines = []
+    line_index = start_line_index
+
+    for n, (start, end) in enumerate(zip(starts, ends)):
+        text = " ".join(texts[start:end])
+
+        # unique fonts / sizes in reading order, like the loop version
+        line = build_line_dict(
+            text,
+            line_index,
+            page_index,
+            line_tops[n],
+            list(dict.fromkeys(sizes[start:end])),
+            list(dict.fromkeys(fonts[start:end]))
+        )
+        line["layout"]["x0"] = line_x0s[n]
+        line["layout"]["x1"] = line_x1s[n]
+
+        lines.append(line)
+        line_index += 1
+
+    return lines, line_index
+
+
+#Same as extract_lines_pdf's signature, for pdfplumber's list of word dicts
+def cluster_lines_np(words, page_index, start_line_index, threshold=2):
+    if not words:
+        return [], start_line_index
+
+    # one C-level pass over the word dicts, then column tuples
+    columns = list(zip(*map(itemgetter("top", "x0", "x1", "text", "fontname", "size"), words)))
+    tops, x0s, x1s = np.array(columns[:3], dtype=np.float64)
+
+    return cluster_word_arrays(
+        tops, x0s, x1s,
+        columns[3], columns[4], columns[5],
+        page_index,
+        start_line_index,
+        threshold
+    )
+
+
+def group_page_words(words, page_index, start_line_index):
+    if LINE_ENGINE == "numpy":
+        return cluster_lines_np(words, page_index, start_line_index)
+
+    return extract_lines_pdf(words, page_index, start_line_index)
+
+
+#Extract and repair a contiguous range of pages, line_index is local to the range
+def extract_page_range(pdf_path, page_start, page_end, backend=None):
+    range_lines = []
+    hits, misses = segment_cache.hits, segment_cache.misses
+    chunks, skipped = glue_stats["chunks"], glue_stats["skipped"]
     current_line_index = 0
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_index, page in enumerate(pdf.pages):
-            words = page.extract_words(extra_attrs=["size", "fontname"])
+    # each call opens the pdf itself so it can run inside a worker process
+    for page_index, words in iter_page_words(pdf_path, backend, page_start, page_end):
+        page_lines, current_line_index = group_page_words(
+            words,
+            page_index,
+            current_line_index
+        )
+
+        range_lines.extend(page_lines)
+    range_lines = repair_sentence(range_lines)
+
+    repair_stats = {
+        "hits": segment_cache.hits - hits,
+        "misses": segment_cache.misses - misses,
+        "chunks": glue_stats["chunks"] - chunks,
+        "skipped": glue_stats["skipped"] - skipped
+    }
+
+    return range_lines, repair_stats
+
+
+#Split pages into one contiguous range per worker
+def split_page_ranges(page_count, workers):
+    if page_count <= 0:
+        return []
+
+    ranges = []
+    step = -(-page_count // workers)
 
-            page_lines, current_line_index = extract_lines_pdf(
-                words,
-                page_index,
-                current_line_index
-            )
+    for start in range(0, page_count, step):
+        ranges.append((start, min(start + step, page_count)))
 
-            all_lines.extend(page_lines)
-    all_lines = repair_sentence(all_lines)
+    return ranges
+
+
+def extract_pdf_lines(pdf_path, workers=None, backend=None):
+    workers = workers or EXTRACT_WORKERS
+    backend = backend or PDF_BACKEND
+    start_time = time.time()
+
+    page_count = count_pages(pdf_path, backend)
+
+    workers = max(1, min(workers, page_count))
+    page_ranges = split_page_ranges(page_count, workers)
+
+    if workers == 1:
+        range_results = [extract_page_range(pdf_path, start, end, backend) for start, end in page_ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            range_results = list(pool.map(
+                extract_page_range,
+                [pdf_path] * len(page_ranges),
+                [start for start, _ in page_ranges],
+                [end for _, end in page_ranges],
+                [backend] * len(page_ranges)
+            ))
+
+    # merge in page order and renumber line_index globally (same as a serial walk)
+    all_lines = []
+    repair_stats = {"hits": 0, "misses": 0, "chunks": 0, "skipped": 0}
+    for range_lines, range_stats in range_results:
+        for key in repair_stats:
+            repair_stats[key] += range_stats[key]
+
+        offset = len(all_lines)
+        for line in range_lines:
+            line["line_index"] += offset
+        all_lines.extend(range_lines)
+
+    if EXTRACT_STATS:
+        elapsed = time.time() - start_time
+        pages_per_sec = page_count / elapsed if elapsed else 0
+        print(f"Extracted {page_count} pages ({backend}) with {workers} worker(s) in {elapsed:.2f}s ({pages_per_sec:.1f} pages/sec)")
+        report_glue_stats(repair_stats)
+        report_segment_stats(repair_stats)
 
     return all_lines
 
 
+#Serial extraction that reopens the pdf every `window` pages so parser caches never
+#cover more than one window, and keeps RSS under rss_ceiling_mb by spilling lines
+#to disk (on_ceiling="spill") or raising MemoryCeilingExceeded (on_ceiling="fail")
+def extract_pdf_lines_low_memory(pdf_path, backend=None, window=None, rss_ceiling_mb=None, on_ceiling=None):
+    backend = backend or PDF_BACKEND
+    window = window or PAGE_WINDOW
+    rss_ceiling_mb = RSS_CEILING_MB if rss_ceiling_mb is None else rss_ceiling_mb
+    on_ceiling = on_ceiling or ON_CEILING
+    start_time = time.time()
+
+    page_count = count_pages(pdf_path, backend)
+
+    all_lines = []
+    spilled = None
+    line_count = 0
+    repair_stats = {"hits": 0, "misses": 0, "chunks": 0, "skipped": 0}
+
+    for window_start in range(0, page_count, window):
+        window_end = min(window_start + window, page_count)
+        window_lines, window_stats = extract_page_range(pdf_path, window_start, window_end, backend)
+
+        for key in repair_stats:
+            repair_stats[key] += window_stats[key]
+
+        for line in window_lines:
+            line["line_index"] += line_count
+        line_count += len(window_lines)
+
+        if spilled is not None:
+            spilled.extend(window_lines)
+        else:
+            all_lines.extend(window_lines)
+        del window_lines
+
+        # pdfminer's layout objects are full of reference cycles, free them before measuring
+        gc.collect()
+
+        rss = check_ceiling(rss_ceiling_mb, on_ceiling, window_end, page_count)
+        if rss is not None and spilled is None:
+            print(f"RSS {rss:.0f} MB over the {rss_ceiling_mb} MB ceiling at page {window_end}, spilling lines to disk")
+            spilled = SpilledLines()
+            spilled.extend(all_lines)
+            all_lines = []
+            gc.collect()
+
+    if EXTRACT_STATS:
+        elapsed = time.time() - start_time
+        pages_per_sec = page_count / elapsed if elapsed else 0
+        print(
+            f"Extracted {page_count} pages ({backend}, low memory, {window}-page windows) in {elapsed:.2f}s "
+            f"({pages_per_sec:.1f} pages/sec), RSS {format_mb(current_rss_mb())}, peak {format_mb(peak_rss_mb())}"
+        )
+        report_glue_stats(repair_stats)
+        report_segment_stats(repair_stats)
+
+    return spilled if spilled is not None else all_lines
+
+
+#Yield repaired lines one page at a time, line_index keeps counting across pages
+def iter_pdf_pages(pdf_path, backend=None):
+    current_line_index = 0
+
+    for page_index, words in iter_page_words(pdf_path, backend):
+        page_lines, current_line_index = group_page_words(
+            words,
+            page_index,
+            current_line_index
+        )
+
+        yield repair_sentence(page_lines)
+
+
+
+# DOCX EXTRACTOR
+
+# Word has no layout to read back, paragraphs are laid out on a simulated Letter page
+# so layout.top and page_index stay in the same range as pdfplumber's
+DOCX_PAGE_HEIGHT = 792
+DOCX_LINE_SPACING = 1.2
+# average glyph width as a share of the font size, used to estimate wrapped lines
+DOCX_CHAR_WIDTH = 0.5
+DOCX_DEFAULT_SIZE = 11.0
+
+
+def style_chain(style):
+    while style is not None:
+        yield style
+        style = style.base_style
+
+
+def font_value(font, attr):
+    value = getattr(font, attr)
+
+    # python-docx only reads w:ascii, most templates name theme fonts (w:asciiTheme) instead
+    if attr == "name" and value is None:
+        rpr = font._element.rPr
+        if rpr is not None and rpr.rFonts is not None:
+            value = rpr.rFonts.get(qn("w:asciiTheme"))
+
+    return value
+
+
+#First value set on the run, its character style, or the paragraph style and its bases
+def resolve_font_attr(run, paragraph, attr):
+    value = font_value(run.font, attr)
+    if value is not None:
+        return value
+
+    for style in list(style_chain(run.style)) + list(style_chain(paragraph.style)):
+        value = font_value(style.font, attr)
+        if value is not None:
+            return value
+
+    return None
+
+
+#Size and font name from <w:docDefaults>, what Word uses when no style sets them
+def docx_defaults(document):
+    size, name = DOCX_DEFAULT_SIZE, "Unknown"
+    rpr = document.styles.element.find(qn("w:docDefaults") + "/" + qn("w:rPrDefault") + "/" + qn("w:rPr"))
+
+    if rpr is not None:
+        sz = rpr.find(qn("w:sz"))
+        if sz is not None:
+            size = int(sz.get(qn("w:val"))) / 2
+
+        fonts = rpr.find(qn("w:rFonts"))
+        if fonts is not None:
+            # theme fonts only carry a slot name, still stable within one document
+            name = fonts.get(qn("w:ascii")) or fonts.get(qn("w:asciiTheme")) or name
+
+    return size, name
+
+
+#Font name the way pdf fonts are named, bold/italic runs become "Name-Bold" etc.
+def docx_font_name(name, bold, italic):
+    suffix = ("Bold" if bold else "") + ("Italic" if italic else "")
+    return f"{name}-{suffix}" if suffix else name
+
+
+def iter_docx_paragraphs(document):
+    for block in document.iter_inner_content():
+        if hasattr(block, "rows"):
+            # table cells read row by row, merged cells repeat the same <w:tc>
+            # (lxml elements hash by identity, the set keeps them alive so it stays stable)
+            seen = set()
+            for row in block.rows:
+                for cell in row.cells:
+                    if cell._tc in seen:
+                        continue
+                    seen.add(cell._tc)
+                    yield from cell.paragraphs
+        else:
+            yield block
+
+
+def length_pt(length, default):
+    return length.pt if length is not None else default
+
+
+def has_page_break(paragraph):
+    for br in paragraph._p.iter(qn("w:br")):
+        if br.get(qn("w:type")) == "page":
+            return True
+    return False
+
+
+#Extract one line per non-empty paragraph with the same schema and features as pdf lines
+def extract_docx_lines(docx_path):
+    document = Document(docx_path)
+    default_size, default_font = docx_defaults(document)
+
+    section = document.sections[0]
+    top_margin = length_pt(section.top_margin, 72)
+    bottom_margin = length_pt(section.bottom_margin, 72)
+    text_width = length_pt(section.page_width, 612) - length_pt(section.left_margin, 72) - length_pt(section.right_margin, 72)
+
+    all_lines = []
+    line_index = 0
+    page_index = 0
+    top = top_margin
+
+    for paragraph in iter_docx_paragraphs(document):
+        if has_page_break(paragraph) and top > top_margin:
+            page_index += 1
+            top = top_margin
+
+        text = paragraph.text.strip()
+        if not text:
+            top += default_size * DOCX_LINE_SPACING
+            continue
+
+        fonts = []
+        sizes = []
+
+        for run in paragraph.runs:
+            if not run.text.strip():
+                continue
+
+            size = resolve_font_attr(run, paragraph, "size")
+            name = resolve_font_attr(run, paragraph, "name") or default_font
+
+            sizes.append(round(size.pt, 1) if size is not None else default_size)
+            fonts.append(docx_font_name(
+                name,
+                resolve_font_attr(run, paragraph, "bold"),
+                resolve_font_attr(run, paragraph, "italic")
+            ))
+
+        # text from fields / hyperlinks has no plain runs, fall back to the paragraph style
+        if not sizes:
+            size = next((s.font.size for s in style_chain(paragraph.style) if s.font.size is not None), None)
+            sizes = [round(size.pt, 1) if size is not None else default_size]
+            fonts = [default_font]
+
+        size = max(sizes)
+        line_height = size * DOCX_LINE_SPACING
+        chars_per_line = max(1, int(text_width / (size * DOCX_CHAR_WIDTH)))
+        height = -(-len(text) // chars_per_line) * line_height
+
+        if top + line_height > DOCX_PAGE_HEIGHT - bottom_margin:
+            page_index += 1
+            top = top_margin
+
+        all_lines.append(build_line_dict(
+            text,
+            line_index,
+            page_index=page_index,
+            top=round(top, 2),
+            sizes=sizes,
+            fonts=fonts
+        ))
+
+        line_index += 1
+        top += height + size * 0.5
+
+    return repair_sentence(all_lines)
+
+
+#Pages of extract_docx_lines, for the streaming path
+def iter_docx_pages(docx_path):
+    page_lines = []
+
+    for line in extract_docx_lines(docx_path):
+        if page_lines and line["page_index"] != page_lines[-1]["page_index"]:
+            yield page_lines
+            page_lines = []
+        page_lines.append(line)
+
+    if page_lines:
+        yield page_lines
+
 
 # SHARED LINE DICT BUILDER
 
@@ -205,6 +630,43 @@ def build_line_dict(text, line_index, page_index, top, sizes, fonts):
 
 # UNIFIED ENTRY POINT
 
-def extract_document_lines(file_path):
-        return extract_pdf_lines(file_path)
+def is_docx(file_path):
+        return os.path.splitext(file_path)[1].lower() == ".docx"
+
+# settings that change extracted lines, part of the cache key
+def extraction_variant(backend=None, file_path=None):
+        if file_path is not None and is_docx(file_path):
+            return "docx"
+        return f"{LINE_ENGINE}-{backend or PDF_BACKEND}"
+
+def extract_document_lines(file_path, workers=None, use_cache=True, backend=None, low_memory=None):
+        low_memory = LOW_MEMORY if low_memory is None else low_memory
+
+        # unchanged documents come straight from the content-hash cache
+        if use_cache:
+            lines = load_cached_lines(file_path, extraction_variant(backend, file_path))
+            if lines is not None:
+                return lines
+
+        if is_docx(file_path):
+            lines = extract_docx_lines(file_path)
+        elif low_memory:
+            lines = extract_pdf_lines_low_memory(file_path, backend=backend)
+        else:
+            lines = extract_pdf_lines(file_path, workers=workers, backend=backend)
+
+        # spilled lines are too big to hold in memory, so they are too big to cache as well
+        if use_cache and not isinstance(lines, SpilledLines):
+            store_cached_lines(file_path, extraction_variant(backend, file_path), lines)
+
+        return lines
+
+# streaming variant, yields one list of lines per page
+def iter_document_lines(file_path, backend=None):
+        if is_docx(file_path):
+            return iter_docx_pages(file_path)
+        return iter_pdf_pages(file_path, backend)
 
+# compact variant, same lines packed into a columnar LineTable
+def extract_document_table(file_path, backend=None):
+        return LineTable.from_pages(iter_document_lines(file_path, backend))
@@ -0,0 +1,161 @@
+from itertools import islice
+from operator import itemgetter
+
+import numpy as np
+
+from .line_table import LineTable
+
+# Column order of the classifier's feature matrix, saved as artifact["feature_order"]
+FEATURE_ORDER = [
+    "word_count",
+    "has_symbol",
+    "starts_with_number",
+    "ends_with_punctuation",
+    "is_paragraph_font",
+    "is_heading_size",
+    "normalized_top",
+    "is_tiny",
+    "is_numeric_only",
+    "alpha_ratio",
+    "digit_ratio",
+    "symbol_ratio",
+    "has_math_symbol",
+]
+
+# page height the top coordinate is scaled by
+TOP_SCALE = 800
+
+# lines per step when the lines come from an iterator instead of a list
+CHUNK_LINES = 10000
+
+# fields added by repair_sentence, lines that skipped it read them as 0
+REPAIR_FIELDS = ("is_tiny", "is_numeric_only", "alpha_ratio", "digit_ratio", "symbol_ratio", "has_math_symbol")
+
+
+#Raise if an artifact was trained on a different feature schema than this module builds
+def validate_feature_order(feature_order):
+    if feature_order is None:
+        raise ValueError("Classifier artifact has no feature_order, retrain it with build_model.py")
+
+    if list(feature_order) != FEATURE_ORDER:
+        missing = [name for name in FEATURE_ORDER if name not in feature_order]
+        extra = [name for name in feature_order if name not in FEATURE_ORDER]
+        raise ValueError(
+            f"Classifier feature_order does not match features.FEATURE_ORDER "
+            f"(missing {missing}, unexpected {extra}, or a different order)"
+        )
+
+
+#Reference single-line version, kept for debugging and for checking build_feature_matrix
+def line_to_features(line, insights):
+    fonts = set(line["style_stats"].keys())
+    sizes = set(line["size_stats"].keys())
+
+    return [
+        line["word_count"],
+        int(line["has_symbol"]),
+        int(line["starts_with_number"]),
+        int(line["ends_with_punctuation"]),
+        int(insights.get("paragraph_font") in fonts),
+        int(insights.get("heading_size") in sizes if insights.get("heading_size") else 0),
+        round(line["layout"]["top"] / TOP_SCALE, 3),
+
+        line.get("is_tiny", 0),
+        line.get("is_numeric_only", 0),
+        round(line.get("alpha_ratio", 0), 3),
+        round(line.get("digit_ratio", 0), 3),
+        round(line.get("symbol_ratio", 0), 3),
+        line.get("has_math_symbol", 0),
+    ]
+
+
+def dict_columns(lines, insights):
+    paragraph_font = insights.get("paragraph_font")
+    heading_size = insights.get("heading_size")
+
+    columns = {
+        name: np.array([line[name] for line in lines], dtype=np.float64)
+        for name in ("word_count", "has_symbol", "starts_with_number", "ends_with_punctuation")
+    }
+    columns["top"] = np.array([line["layout"]["top"] for line in lines], dtype=np.float64)
+
+    for name in REPAIR_FIELDS:
+        columns[name] = np.array([line.get(name, 0) for line in lines], dtype=np.float64)
+
+    style_stats = map(itemgetter("style_stats"), lines)
+    columns["is_paragraph_font"] = np.array([paragraph_font in stats for stats in style_stats], dtype=np.float64)
+
+    if heading_size:
+        size_stats = map(itemgetter("size_stats"), lines)
+        columns["is_heading_size"] = np.array([heading_size in stats for stats in size_stats], dtype=np.float64)
+    else:
+        columns["is_heading_size"] = np.zeros(len(columns["top"]))
+
+    return columns
+
+
+#Same columns straight from a LineTable's arrays, no per-line Python at all
+def table_columns(table, insights):
+    columns = {name: table.columns[name].astype(np.float64) for name in (
+        "word_count", "has_symbol", "starts_with_number", "ends_with_punctuation", "top"
+    )}
+
+    # repair fields of lines that skipped repair_sentence are stored as 0 already
+    for name in REPAIR_FIELDS:
+        columns[name] = table.columns[name].astype(np.float64)
+
+    def lines_with(offsets, match):
+        line_of_entry = np.repeat(np.arange(len(table)), np.diff(offsets))
+        return (np.bincount(line_of_entry[match], minlength=len(table)) > 0).astype(np.float64)
+
+    paragraph_font = table.font_ids.get(insights.get("paragraph_font"))
+    if paragraph_font is None:
+        columns["is_paragraph_font"] = np.zeros(len(table))
+    else:
+        columns["is_paragraph_font"] = lines_with(table.style_offsets, table.style_keys == paragraph_font)
+
+    heading_size = insights.get("heading_size")
+    if heading_size:
+        columns["is_heading_size"] = lines_with(table.size_offsets, table.size_keys == heading_size)
+    else:
+        columns["is_heading_size"] = np.zeros(len(table))
+
+    return columns
+
+
+#np.round scales by 10**digits first, so values like 1/80 = 0.0125 land on an exact .5 and
+#round half-even, where round() sees the true binary value and rounds up; redo those few
+#near-ties with round() so the features stay what the model was trained on
+def round_like_python(values, digits):
+    rounded = np.round(values, digits)
+
+    scaled = values * 10 ** digits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), digits)
+
+    return rounded
+
+
+#float32 feature matrix for a whole document (list of line dicts or a LineTable),
+#columns in feature_order, values identical to line_to_features
+def build_feature_matrix(lines, insights, feature_order=FEATURE_ORDER):
+    if isinstance(lines, LineTable):
+        columns = table_columns(lines, insights)
+    elif isinstance(lines, list):
+        columns = dict_columns(lines, insights)
+    else:
+        # other iterables (e.g. SpilledLines) are read once, a chunk of dicts at a time
+        lines = iter(lines)
+        chunks = iter(lambda: list(islice(lines, CHUNK_LINES)), [])
+        matrices = [build_feature_matrix(chunk, insights, feature_order) for chunk in chunks]
+        return np.concatenate(matrices) if matrices else np.empty((0, len(feature_order)), dtype=np.float32)
+
+    columns["normalized_top"] = round_like_python(columns.pop("top") / TOP_SCALE, 3)
+    for name in ("alpha_ratio", "digit_ratio", "symbol_ratio"):
+        columns[name] = round_like_python(columns[name], 3)
+
+    if not len(columns["word_count"]):
+        return np.empty((0, len(feature_order)), dtype=np.float32)
+
+    return np.column_stack([columns[name] for name in feature_order]).astype(np.float32)
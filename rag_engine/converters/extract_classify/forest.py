@@ -0,0 +1,260 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .doc_cache import ROOT_DIR, file_sha256
+
+# Flattened copies of trained forests, one directory per model file hash
+FOREST_CACHE_DIR = os.environ.get("FOREST_CACHE_DIR", os.path.join(ROOT_DIR, ".cache", "forest"))
+
+FOREST_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+# Bump when the exported array layout changes, older exports are then rebuilt
+FOREST_FORMAT = 2
+
+# rows predicted per step, the node matrix is BLOCK_ROWS x n_trees
+BLOCK_ROWS = 512
+
+# "compiled" walks the trees with numba when it is installed, "numpy" walks them level by
+# level with NumPy (same probabilities bit for bit), "auto" picks compiled from
+# COMPILED_MIN_ROWS rows on so small batches skip numba's ~0.5s import
+FOREST_KERNEL = os.environ.get("FOREST_KERNEL", "auto")
+COMPILED_MIN_ROWS = 256
+
+
+#Flatten every tree of a fitted RandomForestClassifier into shared node arrays:
+#node ids are global, roots[t] is tree t's root and leaves point back at themselves
+#(left == right == node, threshold +inf) so a walk can keep stepping once it got there
+def export_forest(artifact, out_dir):
+    model = artifact["model"]
+    trees = [estimator.tree_ for estimator in model.estimators_]
+
+    roots = np.zeros(len(trees), dtype=np.int64)
+    feature, threshold, left, right, value = [], [], [], [], []
+    offset = 0
+
+    for t, tree in enumerate(trees):
+        roots[t] = offset
+
+        is_leaf = tree.children_left < 0
+        node_ids = np.arange(tree.node_count) + offset
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+
+        # since sklearn 1.4 tree_.value already holds class fractions, which is
+        # exactly what DecisionTreeClassifier.predict_proba returns per leaf
+        value.append(tree.value[:, 0, :model.n_classes_].astype(np.float64))
+
+        offset += tree.node_count
+
+    arrays = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left),
+        "right": np.concatenate(right),
+        "value": np.concatenate(value),
+        "roots": roots,
+    }
+
+    meta = {
+        "n_trees": len(trees),
+        "n_features": int(model.n_features_in_),
+        "max_depth": int(max(tree.max_depth for tree in trees)),
+        "classes": [int(c) for c in model.classes_],
+        "label_map": artifact["label_map"],
+        "feature_order": artifact.get("feature_order"),
+    }
+
+    # build next to the target and rename so a reader never sees half the arrays
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".forest_")
+
+    for name, data in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), data)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    try:
+        os.rename(tmp_dir, out_dir)
+    except OSError:
+        # another process exported the same model first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return out_dir
+
+
+#RandomForest predictor over memory-mapped node arrays, processes share the pages
+class FlatForest:
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+
+        self.n_trees = meta["n_trees"]
+        self.n_features = meta["n_features"]
+        self.max_depth = meta["max_depth"]
+        self.classes = np.asarray(meta["classes"])
+        self.label_map = meta["label_map"]
+        self.feature_order = meta["feature_order"]
+
+    @classmethod
+    def load(cls, forest_dir, mmap_mode="r"):
+        with open(os.path.join(forest_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        arrays = {
+            name: np.load(os.path.join(forest_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in FOREST_ARRAYS
+        }
+        return cls(arrays, meta)
+
+    #Leaf reached in every tree for every row, all trees advance one level per step
+    def leaf_matrix(self, X):
+        rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(rows, dtype=np.int32) * n_features)[:, np.newaxis]
+        node = np.broadcast_to(self.roots.astype(np.int32), (rows, self.n_trees)).copy()
+
+        for _ in range(self.max_depth):
+            go_left = flat_X[row_offsets + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        return node
+
+    def numpy_proba(self, X, block_rows=BLOCK_ROWS):
+        proba = np.empty((X.shape[0], len(self.classes)), dtype=np.float64)
+
+        # row blocks keep the (rows, trees, classes) leaf values at a few MB
+        for start in range(0, X.shape[0], block_rows):
+            leaf_values = self.value[self.leaf_matrix(X[start:start + block_rows])]
+
+            # cumsum adds tree by tree in order, the same float sums as sklearn's
+            # single-threaded accumulation (np.sum would add pairwise)
+            proba[start:start + block_rows] = np.cumsum(leaf_values, axis=1)[:, -1]
+
+        return proba
+
+    def predict_proba(self, X, kernel=None):
+        # sklearn compares float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        kernel = kernel or FOREST_KERNEL
+
+        walk = None
+        if kernel == "compiled" or (kernel == "auto" and len(X) >= COMPILED_MIN_ROWS):
+            walk = compiled_walk()
+        if walk is not None:
+            proba = np.zeros((X.shape[0], len(self.classes)), dtype=np.float64)
+            walk(X, np.asarray(self.roots), np.asarray(self.feature), np.asarray(self.threshold),
+                 np.asarray(self.left), np.asarray(self.right), np.asarray(self.value), proba)
+        else:
+            proba = self.numpy_proba(X)
+
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X, kernel=None):
+        return self.classes.take(np.argmax(self.predict_proba(X, kernel), axis=1))
+
+
+_compiled_walk = None
+
+
+#Tree-by-tree walk compiled with numba, None when numba isn't installed
+def compiled_walk():
+    global _compiled_walk
+
+    if _compiled_walk is None:
+        try:
+            import numba
+        except ImportError:
+            _compiled_walk = False
+            return None
+
+        def walk(X, roots, feature, threshold, left, right, value, proba):
+            # trees outermost so one tree's nodes stay in cache, each row still sums in tree order
+            for t in range(roots.shape[0]):
+                for i in range(X.shape[0]):
+                    node = roots[t]
+                    while True:
+                        if X[i, feature[node]] <= threshold[node]:
+                            child = left[node]
+                        else:
+                            child = right[node]
+                        if child == node:
+                            break
+                        node = child
+                    for c in range(proba.shape[1]):
+                        proba[i, c] += value[node, c]
+
+        try:
+            # cache=True keeps the machine code next to this file so other processes skip the JIT
+            _compiled_walk = numba.njit(cache=True, nogil=True)(walk)
+        except RuntimeError:
+            _compiled_walk = numba.njit(nogil=True)(walk)
+
+    return _compiled_walk or None
+
+
+#FlatForest for a joblib artifact, exported on first use and reused while the file is unchanged.
+#When the artifact's model isn't a tree forest the unpickled artifact itself is returned,
+#so the caller doesn't load the file a second time
+def load_flat_forest(model_path):
+    forest_dir = os.path.join(FOREST_CACHE_DIR, f"{file_sha256(model_path)[:16]}.v{FOREST_FORMAT}")
+
+    if not os.path.exists(os.path.join(forest_dir, "meta.json")):
+        import joblib
+        artifact = joblib.load(model_path)
+
+        # distilled / boosted artifacts from build_model.py have no flat form
+        if not is_flat_exportable(artifact["model"]):
+            return artifact
+        export_forest(artifact, forest_dir)
+
+    return FlatForest.load(forest_dir)
+
+
+def is_flat_exportable(model):
+    return type(model).__name__ in ("RandomForestClassifier", "ExtraTreesClassifier")
+
+
+#Latency of both FlatForest kernels against sklearn's predict on row samples of the given sizes
+def benchmark_forest(model_path, X, sizes=(100, 1000, 10000), repeats=5):
+    import time
+    import joblib
+
+    sklearn_model = joblib.load(model_path)["model"]
+    forest = load_flat_forest(model_path)
+    rng = np.random.default_rng(0)
+
+    predictors = {"sklearn": sklearn_model.predict, "numpy": lambda X: forest.predict(X, kernel="numpy")}
+    if compiled_walk() is not None:
+        # first call triggers (or loads) the JIT, keep it out of the timings
+        forest.predict(np.asarray(X[:1], dtype=np.float32), kernel="compiled")
+        predictors["compiled"] = lambda X: forest.predict(X, kernel="compiled")
+
+    print(f"{'rows':>6} " + " ".join(f"{name + ' ms':>12}" for name in predictors) + f" {'same labels':>12}")
+    for size in sizes:
+        sample = np.asarray(X, dtype=np.float32)[rng.integers(0, len(X), size)]
+        timings = {}
+        labels = {}
+
+        for name, predict in predictors.items():
+            best = float("inf")
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                labels[name] = predict(sample)
+                best = min(best, time.perf_counter() - start_time)
+            timings[name] = best
+
+        same = all(np.array_equal(labels["sklearn"], other) for other in labels.values())
+        print(f"{size:>6} " + " ".join(f"{timings[name] * 1000:>12.1f}" for name in predictors) + f" {str(same):>12}")
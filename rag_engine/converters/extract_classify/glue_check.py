@@ -0,0 +1,47 @@
+import re
+
+# A page whose words look like normal prose only sends very long runs to the segmenter
+NORMAL_MEAN_WORD_LEN = 6.5
+NORMAL_LONG_WORD_SHARE = 0.02
+LONG_WORD_LEN = 13
+
+glue_stats = {"chunks": 0, "skipped": 0}
+
+
+#Decide per page whether the text is already correctly spaced
+def page_is_well_formed(texts):
+    words = []
+    for text in texts:
+        words.extend(re.findall(r"[A-Za-z]+", text))
+
+    if not words:
+        return True
+
+    mean_len = sum(len(word) for word in words) / len(words)
+    long_share = sum(len(word) >= LONG_WORD_LEN for word in words) / len(words)
+
+    return mean_len <= NORMAL_MEAN_WORD_LEN and long_share <= NORMAL_LONG_WORD_SHARE
+
+
+def well_formed_pages(all_lines):
+    page_texts = {}
+    for line in all_lines:
+        page_texts.setdefault(line["page_index"], []).append(line["text"])
+
+    return {page: page_is_well_formed(texts) for page, texts in page_texts.items()}
+
+
+#Only suspected glued runs should reach the segmenter
+def chunk_needs_segmentation(chunk, well_formed_page):
+    glue_stats["chunks"] += 1
+
+    if well_formed_page and len(chunk) < LONG_WORD_LEN:
+        glue_stats["skipped"] += 1
+        return False
+
+    return True
+
+
+def report_glue_stats(stats):
+    skipped_share = stats["skipped"] / stats["chunks"] if stats["chunks"] else 0
+    print(f"Glue check: skipped {stats['skipped']}/{stats['chunks']} chunks ({skipped_share:.1%})")
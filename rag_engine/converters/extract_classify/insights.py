@@ -2,6 +2,8 @@ import pdfplumber
 import re
 
 from .extractor import extract_document_lines
+from .doc_cache import load_cached_profile, store_cached_profile
+from .line_table import LineTable
 
 #-helps in building stats and checking text properties
 def build_stats(items):
@@ -28,28 +30,120 @@ def ends_with_punctuation(text):
 
 
 # -------- OUTPUT --------
-#Over all document stats as fonts and sizes count
-def doc_stats(all_lines):
-    fonts_count = {}
-    sizes_count = {}
-    for line in all_lines:
-        
+#Document-level font and size counts, built incrementally as lines come out of the extractor
+class DocumentProfile:
+
+    def __init__(self, fonts_count=None, sizes_count=None, line_count=0):
+        self.fonts_count = fonts_count if fonts_count is not None else {}
+        self.sizes_count = sizes_count if sizes_count is not None else {}
+        self.line_count = line_count
+        self._insights = None
+
+    @classmethod
+    def from_lines(cls, lines):
+        profile = cls()
+        if isinstance(lines, LineTable):
+            return profile.add_table(lines)
+        profile.add_lines(lines)
+        return profile
+
+    def add_line(self, line):
         for key, value in line['size_stats'].items():
-            
-            normalized_size = round(key, 1)  
-            if normalized_size in sizes_count:
-                sizes_count[normalized_size] += value
-            else:
-                sizes_count[normalized_size] = value
-        
+            normalized_size = round(key, 1)
+            self.sizes_count[normalized_size] = self.sizes_count.get(normalized_size, 0) + value
+
         for key, value in line['style_stats'].items():
-            
-            if key in fonts_count:
-                fonts_count[key] += value
-            else:
-                fonts_count[key] = value
+            self.fonts_count[key] = self.fonts_count.get(key, 0) + value
+
+        self.line_count += 1
+        self._insights = None
+
+    def add_lines(self, lines):
+        for line in lines:
+            self.add_line(line)
+        return self
+
+    #Same counts (and first-seen order) as add_lines, read from the table's flat stats arrays
+    def add_table(self, table):
+        for key, value in zip(table.size_keys.tolist(), table.size_counts.tolist()):
+            normalized_size = round(key, 1)
+            self.sizes_count[normalized_size] = self.sizes_count.get(normalized_size, 0) + value
+
+        for font_id, value in zip(table.style_keys.tolist(), table.style_counts.tolist()):
+            font = table.fonts[font_id]
+            self.fonts_count[font] = self.fonts_count.get(font, 0) + value
+
+        self.line_count += len(table)
+        self._insights = None
+        return self
+
+    #Same dict main_ex returns, computed once until more lines are added
+    def as_insights(self):
+        if self._insights is None:
+            headings_fonts, paragraphs_fonts = font_insights(self.fonts_count)
+            headings_size, paragraphs_size = size_insights(self.sizes_count)
+
+            self._insights = {
+                "paragraph_font": paragraphs_fonts,
+                "heading_font": headings_fonts,
+                "paragraph_size": paragraphs_size,
+                "heading_size": headings_size
+            }
+
+        return self._insights
+
+    @property
+    def paragraph_font(self):
+        return self.as_insights()["paragraph_font"]
+
+    @property
+    def heading_fonts(self):
+        return self.as_insights()["heading_font"]
 
-    return fonts_count, sizes_count
+    @property
+    def paragraph_size(self):
+        return self.as_insights()["paragraph_size"]
+
+    @property
+    def heading_size(self):
+        return self.as_insights()["heading_size"]
+
+    # sizes are float keys, stored as pairs so JSON keeps them (and their order) intact
+    def to_dict(self):
+        return {
+            "fonts_count": self.fonts_count,
+            "sizes_count": list(self.sizes_count.items()),
+            "line_count": self.line_count
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            fonts_count=dict(data["fonts_count"]),
+            sizes_count={size: count for size, count in data["sizes_count"]},
+            line_count=data["line_count"]
+        )
+
+
+#Profile for a document, read from the extraction cache or built from its lines and stored there
+def document_profile(file_path, lines, variant, use_cache=True):
+    if use_cache:
+        cached = load_cached_profile(file_path, variant)
+        if cached is not None:
+            return DocumentProfile.from_dict(cached)
+
+    profile = DocumentProfile.from_lines(lines)
+
+    if use_cache:
+        store_cached_profile(file_path, variant, profile.to_dict())
+
+    return profile
+
+
+#Over all document stats as fonts and sizes count
+def doc_stats(all_lines):
+    profile = DocumentProfile.from_lines(all_lines)
+    return profile.fonts_count, profile.sizes_count
 
 #return heading and paragraph fonts
 def font_insights(fonts_count):
@@ -121,20 +215,7 @@ def size_insights(sizes_count):
 
 #main funcation to call all other functions and return final insights
 def main_ex(all_lines):
-    
-    #all_lines = extract_document_lines(pdf_path)
-
-    fonts_count, sizes_count = doc_stats(all_lines)
-    headings_fonts, paragraphs_fonts = font_insights(fonts_count)
-    headings_size, paragraphs_size = size_insights(sizes_count)
-
-    para_head_dict = {
-        "paragraph_font": paragraphs_fonts,
-        "heading_font": headings_fonts,
-        "paragraph_size": paragraphs_size,
-        "heading_size": headings_size
-    }
-    return para_head_dict
+    return DocumentProfile.from_lines(all_lines).as_insights()
 
 # --Can call multiple pdfs
 '''
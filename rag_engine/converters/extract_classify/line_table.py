@@ -0,0 +1,209 @@
+from array import array
+
+import numpy as np
+
+# scalar per-line fields and the array typecode they are stored with
+SCALAR_COLUMNS = {
+    "line_index": "q",
+    "page_index": "l",
+    "top": "d",
+    "x0": "d",
+    "x1": "d",
+    "word_count": "l",
+    "has_symbol": "b",
+    "starts_with_number": "b",
+    "ends_with_punctuation": "b",
+    "is_tiny": "b",
+    "is_numeric_only": "b",
+    "alpha_ratio": "d",
+    "digit_ratio": "d",
+    "symbol_ratio": "d",
+    "has_math_symbol": "b",
+}
+
+# fields that were bools in the line dicts (the rest of the "b" columns are 0/1 ints)
+BOOL_COLUMNS = {"has_symbol", "starts_with_number", "ends_with_punctuation"}
+
+# fields added by repair_sentence, lines that never went through it read them as missing
+REPAIR_COLUMNS = ("is_tiny", "is_numeric_only", "alpha_ratio", "digit_ratio", "symbol_ratio", "has_math_symbol")
+
+
+#Columnar storage for extracted lines: NumPy arrays instead of one dict per line
+class LineTable:
+
+    def __init__(self):
+        self.texts = []
+        self.columns = {name: array(code) for name, code in SCALAR_COLUMNS.items()}
+        self.repaired = array("b")
+
+        # size_stats / style_stats are ragged, stored flat with per-line offsets
+        self.size_offsets = array("q", [0])
+        self.size_keys = array("d")
+        self.size_counts = array("l")
+
+        self.style_offsets = array("q", [0])
+        self.style_keys = array("l")
+        self.style_counts = array("l")
+
+        # font names interned into integer ids
+        self.fonts = []
+        self.font_ids = {}
+
+        self.frozen = False
+
+    @classmethod
+    def from_lines(cls, lines):
+        table = cls()
+        table.extend(lines)
+        return table.freeze()
+
+    #Build from iter_document_lines() so only one page of dicts is alive at a time
+    @classmethod
+    def from_pages(cls, pages):
+        table = cls()
+        for page_lines in pages:
+            table.extend(page_lines)
+        return table.freeze()
+
+    def font_id(self, font):
+        if font not in self.font_ids:
+            self.font_ids[font] = len(self.fonts)
+            self.fonts.append(font)
+        return self.font_ids[font]
+
+    def extend(self, lines):
+        if self.frozen:
+            raise ValueError("LineTable is frozen, build a new one to add lines")
+
+        for line in lines:
+            self.texts.append(line["text"])
+            self.repaired.append(1 if "alpha_ratio" in line else 0)
+
+            for name, column in self.columns.items():
+                if name in ("top", "x0", "x1"):
+                    # x0/x1 only exist for lines grouped by cluster_lines_np
+                    column.append(line["layout"].get(name, np.nan))
+                else:
+                    column.append(line.get(name, 0))
+
+            for size, count in line["size_stats"].items():
+                self.size_keys.append(size)
+                self.size_counts.append(count)
+            self.size_offsets.append(len(self.size_keys))
+
+            for font, count in line["style_stats"].items():
+                self.style_keys.append(self.font_id(font))
+                self.style_counts.append(count)
+            self.style_offsets.append(len(self.style_keys))
+
+    #Swap the growable arrays for NumPy arrays once all lines are in
+    def freeze(self):
+        if self.frozen:
+            return self
+
+        self.columns = {name: np.frombuffer(column, dtype=column.typecode) for name, column in self.columns.items()}
+        self.repaired = np.frombuffer(self.repaired, dtype=np.int8)
+
+        self.size_offsets = np.frombuffer(self.size_offsets, dtype=np.int64)
+        self.size_keys = np.frombuffer(self.size_keys, dtype=np.float64)
+        self.size_counts = np.frombuffer(self.size_counts, dtype=self.size_counts.typecode)
+
+        self.style_offsets = np.frombuffer(self.style_offsets, dtype=np.int64)
+        self.style_keys = np.frombuffer(self.style_keys, dtype=self.style_keys.typecode)
+        self.style_counts = np.frombuffer(self.style_counts, dtype=self.style_counts.typecode)
+
+        self.frozen = True
+        return self
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("line index out of range")
+        return LineView(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield LineView(self, i)
+
+    def size_stats(self, i):
+        start, end = self.size_offsets[i], self.size_offsets[i + 1]
+        return {
+            float(size): int(count)
+            for size, count in zip(self.size_keys[start:end], self.size_counts[start:end])
+        }
+
+    def style_stats(self, i):
+        start, end = self.style_offsets[i], self.style_offsets[i + 1]
+        return {
+            self.fonts[font]: int(count)
+            for font, count in zip(self.style_keys[start:end], self.style_counts[start:end])
+        }
+
+    def nbytes(self):
+        arrays = list(self.columns.values()) + [
+            self.repaired,
+            self.size_offsets, self.size_keys, self.size_counts,
+            self.style_offsets, self.style_keys, self.style_counts,
+        ]
+        return sum(a.nbytes if hasattr(a, "nbytes") else a.itemsize * len(a) for a in arrays)
+
+
+#Read-only row of a LineTable that answers the same keys as the old line dict
+class LineView:
+    __slots__ = ("table", "i")
+
+    def __init__(self, table, i):
+        self.table = table
+        self.i = i
+
+    def __getitem__(self, key):
+        table = self.table
+        i = self.i
+
+        if key == "text":
+            return table.texts[i]
+        if key == "layout":
+            layout = {"top": float(table.columns["top"][i])}
+            if not np.isnan(table.columns["x0"][i]):
+                layout["x0"] = float(table.columns["x0"][i])
+                layout["x1"] = float(table.columns["x1"][i])
+            return layout
+        if key == "size_stats":
+            return table.size_stats(i)
+        if key == "style_stats":
+            return table.style_stats(i)
+        if key in SCALAR_COLUMNS and key not in ("top", "x0", "x1"):
+            if key in REPAIR_COLUMNS and not table.repaired[i]:
+                raise KeyError(key)
+
+            value = table.columns[key][i]
+            if key in BOOL_COLUMNS:
+                return bool(value)
+            if SCALAR_COLUMNS[key] == "d":
+                return float(value)
+            return int(value)
+
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        keys = ["text", "line_index", "page_index", "layout", "word_count", "size_stats", "style_stats",
+                "has_symbol", "starts_with_number", "ends_with_punctuation"]
+        if self.table.repaired[self.i]:
+            keys.extend(REPAIR_COLUMNS)
+        return keys
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
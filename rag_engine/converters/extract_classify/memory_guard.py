@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+import tempfile
+
+from .doc_cache import encode_lines, decode_lines
+
+# Low-memory extraction: walk the pdf in windows of PAGE_WINDOW pages, reopening it for each one
+LOW_MEMORY = os.environ.get("LOW_MEMORY", "0") == "1"
+PAGE_WINDOW = int(os.environ.get("PAGE_WINDOW", "50"))
+
+# RSS ceiling in MB (0 = no ceiling) and what to do when it is reached: "spill" or "fail"
+RSS_CEILING_MB = int(os.environ.get("RSS_CEILING_MB", "0"))
+ON_CEILING = os.environ.get("ON_CEILING", "spill")
+
+SPILL_DIR = os.environ.get("SPILL_DIR", tempfile.gettempdir())
+
+_page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class MemoryCeilingExceeded(MemoryError):
+    pass
+
+
+#Current resident set size of this process in MB
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _page_size / (1024 * 1024)
+    except OSError:
+        pass
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+
+    # last resort is the peak, which never goes down but is still an upper bound (None on Windows)
+    return peak_rss_mb()
+
+
+#Peak RSS in MB, None where the resource module doesn't exist (Windows)
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def format_mb(mb):
+    return "n/a" if mb is None else f"{mb:.0f} MB"
+
+
+#Line list kept in a JSONL file instead of memory, iterable as many times as needed
+class SpilledLines:
+
+    def __init__(self, spill_dir=SPILL_DIR):
+        fd, self.path = tempfile.mkstemp(dir=spill_dir, prefix="lines_", suffix=".jsonl")
+        self.file = os.fdopen(fd, "w", encoding="utf-8")
+        self.count = 0
+
+    def extend(self, lines):
+        for line in encode_lines(lines):
+            self.file.write(json.dumps(line, ensure_ascii=False))
+            self.file.write("\n")
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        self.file.flush()
+        with open(self.path, encoding="utf-8") as f:
+            for row in f:
+                yield decode_lines([json.loads(row)])[0]
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+#Called after every window: None if under the ceiling, otherwise spill or raise
+def check_ceiling(rss_ceiling_mb, on_ceiling, pages_done, page_count):
+    if not rss_ceiling_mb:
+        return None
+
+    rss = current_rss_mb()
+    # nothing to measure RSS with (Windows without psutil), the ceiling can't be enforced
+    if rss is None or rss <= rss_ceiling_mb:
+        return None
+
+    if on_ceiling == "fail":
+        raise MemoryCeilingExceeded(
+            f"RSS {rss:.0f} MB is over the {rss_ceiling_mb} MB ceiling "
+            f"after {pages_done}/{page_count} pages"
+        )
+
+    return rss
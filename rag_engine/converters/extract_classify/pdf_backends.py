@@ -0,0 +1,239 @@
+import ctypes
+import os
+import time
+
+import pdfplumber
+
+# "pdfplumber" is the reference engine, "pypdfium2" is the fast one for bulk ingestion
+# (only imported when selected, pdfplumber installs don't need it)
+PDF_BACKEND = os.environ.get("PDF_BACKEND", "pdfplumber")
+
+# same word-splitting tolerances pdfplumber's extract_words uses by default
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+
+def count_pages(pdf_path, backend=None):
+    backend = backend or PDF_BACKEND
+
+    if backend == "pypdfium2":
+        import pypdfium2 as pdfium
+
+        doc = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+#Yield (page_index, words) for pages [page_start, page_end), every word is a dict with
+#text, x0, x1, top, bottom, size and fontname like pdfplumber's extract_words
+def iter_page_words(pdf_path, backend=None, page_start=0, page_end=None):
+    backend = backend or PDF_BACKEND
+
+    if backend == "pdfplumber":
+        return iter_pdfplumber_words(pdf_path, page_start, page_end)
+    if backend == "pypdfium2":
+        return iter_pdfium_words(pdf_path, page_start, page_end)
+
+    raise ValueError(f"Unknown PDF backend: {backend}")
+
+
+def iter_pdfplumber_words(pdf_path, page_start=0, page_end=None):
+    with pdfplumber.open(pdf_path) as pdf:
+        page_end = len(pdf.pages) if page_end is None else page_end
+
+        for page_index in range(page_start, page_end):
+            page = pdf.pages[page_index]
+            words = page.extract_words(extra_attrs=["size", "fontname"])
+
+            # drop pdfplumber's cached layout objects before moving on
+            page.close()
+
+            yield page_index, words
+
+
+def iter_pdfium_words(pdf_path, page_start=0, page_end=None):
+    import pypdfium2 as pdfium
+
+    doc = pdfium.PdfDocument(pdf_path)
+
+    try:
+        page_end = len(doc) if page_end is None else page_end
+
+        for page_index in range(page_start, page_end):
+            page = doc[page_index]
+            textpage = page.get_textpage()
+
+            try:
+                words = pdfium_page_words(textpage, page.get_height())
+            finally:
+                textpage.close()
+                page.close()
+
+            yield page_index, words
+    finally:
+        doc.close()
+
+
+def pdfium_page_words(textpage, page_height):
+    import pypdfium2.raw as pdfium_raw
+
+    handle = textpage.raw
+    char_count = pdfium_raw.FPDFText_CountChars(handle)
+    text = textpage.get_text_range(0, char_count)
+
+    origin_x = ctypes.c_double()
+    origin_y = ctypes.c_double()
+    loose_box = pdfium_raw.FS_RECTF()
+    descent = ctypes.c_float()
+    glyph_width = ctypes.c_float()
+    advance_cache = {}
+    name_buffer = ctypes.create_string_buffer(256)
+    font_flags = ctypes.c_int()
+
+    words = []
+    current = None
+    last_object = None
+    fontname = None
+    font = None
+    font_descent = 0.0
+    last_x0 = None
+
+    for i in range(char_count):
+        char = text[i] if i < len(text) else ""
+
+        # pdfium's generated spaces/newlines are its own guesses, pdfplumber splits on
+        # real whitespace and gaps only, so skip them without ending the word
+        if not char or pdfium_raw.FPDFText_IsGenerated(handle, i):
+            continue
+
+        if char.isspace():
+            current = None
+            continue
+
+        # soft hyphens at line ends come back as U+FFFE
+        if char == "\ufffe":
+            char = "-"
+
+        size = pdfium_raw.FPDFText_GetFontSize(handle, i)
+
+        # font name and descent only change with the text object, look them up once per object
+        text_object = pdfium_raw.FPDFText_GetTextObject(handle, i)
+        text_object_address = ctypes.cast(text_object, ctypes.c_void_p).value
+        if text_object_address != last_object:
+            pdfium_raw.FPDFText_GetFontInfo(handle, i, name_buffer, len(name_buffer), ctypes.byref(font_flags))
+            fontname = name_buffer.value.decode("utf-8", "replace")
+
+            font = pdfium_raw.FPDFTextObj_GetFont(text_object)
+            pdfium_raw.FPDFFont_GetDescent(font, ctypes.c_float(size), ctypes.byref(descent))
+            font_descent = descent.value
+            last_object = text_object_address
+
+        pdfium_raw.FPDFText_GetCharOrigin(handle, i, ctypes.byref(origin_x), ctypes.byref(origin_y))
+        pdfium_raw.FPDFText_GetLooseCharBox(handle, i, ctypes.byref(loose_box))
+
+        # pdfminer's char box spans descent .. descent + size above the baseline
+        char_bottom = page_height - (origin_y.value + font_descent)
+        char_top = char_bottom - size
+        char_x0 = origin_x.value
+
+        # pdfminer ends a char at its advance width, not its ink box, and the
+        # x gap between chars is what decides word breaks
+        advance_key = (last_object, char, size)
+        if advance_key not in advance_cache:
+            if pdfium_raw.FPDFFont_GetGlyphWidth(font, ord(char), ctypes.c_float(size), ctypes.byref(glyph_width)):
+                advance_cache[advance_key] = glyph_width.value
+            else:
+                advance_cache[advance_key] = None
+
+        advance = advance_cache[advance_key]
+        char_x1 = char_x0 + advance if advance else max(loose_box.right, char_x0)
+
+        # ligatures ("fi", "ff") expand to several chars sharing one glyph origin
+        if current is not None and abs(char_x0 - last_x0) < 0.01 and abs(char_top - current["top"]) <= Y_TOLERANCE:
+            current["text"] += char
+            current["x1"] = max(current["x1"], loose_box.right)
+            continue
+        last_x0 = char_x0
+
+        if (
+            current is not None
+            and abs(char_top - current["top"]) <= Y_TOLERANCE
+            and char_x0 - current["x1"] <= X_TOLERANCE
+            and size == current["size"]
+            and fontname == current["fontname"]
+        ):
+            current["text"] += char
+            current["x1"] = max(current["x1"], char_x1)
+            current["top"] = min(current["top"], char_top)
+            current["bottom"] = max(current["bottom"], char_bottom)
+            continue
+
+        current = {
+            "text": char,
+            "x0": char_x0,
+            "x1": char_x1,
+            "top": char_top,
+            "bottom": char_bottom,
+            "size": size,
+            "fontname": fontname
+        }
+        words.append(current)
+
+    return words
+
+
+#Parity and throughput of a backend against the pdfplumber reference
+def compare_backends(pdf_path, backend="pypdfium2", top_tolerance=0.5, size_tolerance=0.01):
+    timings = {}
+    pages = {}
+
+    for name in ("pdfplumber", backend):
+        start_time = time.time()
+        pages[name] = list(iter_page_words(pdf_path, name))
+        timings[name] = time.time() - start_time
+
+    total = 0
+    matched = 0
+
+    for (_, reference), (_, candidate) in zip(pages["pdfplumber"], pages[backend]):
+        total += len(reference)
+        candidates = {}
+        for word in candidate:
+            candidates.setdefault(word["text"], []).append(word)
+
+        for word in reference:
+            for other in candidates.get(word["text"], []):
+                if (
+                    abs(other["top"] - word["top"]) <= top_tolerance
+                    and abs(other["size"] - word["size"]) <= size_tolerance
+                    and other["fontname"] == word["fontname"]
+                ):
+                    matched += 1
+                    break
+
+    # a pdf without words (scanned, image only) has nothing to disagree on
+    parity = matched / total if total else 1.0
+
+    page_count = len(pages["pdfplumber"])
+    for name, elapsed in timings.items():
+        pages_per_sec = page_count / elapsed if elapsed else 0
+        print(f"{name:<10} {page_count} pages in {elapsed:.2f}s ({pages_per_sec:.1f} pages/sec)")
+    print(f"Word parity: {matched}/{total} pdfplumber words matched by {backend} ({parity:.1%})")
+
+    return {
+        "timings": timings,
+        "matched": matched,
+        "total": total,
+        "parity": parity
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    compare_backends(sys.argv[1] if len(sys.argv) > 1 else "test.pdf")
@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+import wordsegment
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+# Bump when the cached value of a chunk changes meaning, old cache files are then ignored
+CACHE_VERSION = 3
+
+# On-disk cache shared by every extractor process, bounded by MAX_ENTRIES rows (LRU)
+CACHE_PATH = os.environ.get(
+    "SEGMENT_CACHE_PATH",
+    os.path.join(ROOT_DIR, ".cache", f"segment_cache_v{CACHE_VERSION}.sqlite")
+)
+MAX_ENTRIES = int(os.environ.get("SEGMENT_CACHE_MAX_ENTRIES", "200000"))
+
+# In-process front cache so repeated chunks don't even hit sqlite
+MEMORY_ENTRIES = 50000
+
+_wordsegment_loaded = False
+
+
+#Load the wordsegment unigram/bigram tables on first real use instead of at import
+def ensure_wordsegment_loaded():
+    global _wordsegment_loaded
+    if not _wordsegment_loaded:
+        wordsegment.load()
+        _wordsegment_loaded = True
+
+
+#Memoizes wordsegment.segment() results keyed by the lowercased chunk
+class SegmentCache:
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        self.memory = OrderedDict()
+        self.pending = {}
+        self.touched = set()
+
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = None
+        self.conn_pid = None
+
+        # rows on disk as far as this process knows: counted once per connection, then
+        # raised by every flush, and only recounted once it passes max_entries
+        self.rows = 0
+
+    def connect(self):
+        # opened lazily, and again after a fork: sqlite connections can't cross processes
+        if self.conn is None or self.conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            self.conn = sqlite3.connect(self.path, timeout=30)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                "chunk TEXT PRIMARY KEY, words TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS segments_last_used ON segments (last_used)")
+            self.conn.commit()
+
+            self.rows = self.conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            self.conn_pid = os.getpid()
+            self.memory.clear()
+            self.pending.clear()
+            self.touched.clear()
+
+        return self.conn
+
+    def remember(self, key, words):
+        self.memory[key] = words
+        self.memory.move_to_end(key)
+
+        if len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def segment(self, chunk):
+        conn = self.connect()
+        key = chunk.lower()
+
+        words = self.memory.get(key)
+        if words is not None:
+            self.memory.move_to_end(key)
+            self.touched.add(key)
+            self.hits += 1
+            return list(words)
+
+        row = conn.execute("SELECT words FROM segments WHERE chunk = ?", (key,)).fetchone()
+        if row is not None:
+            words = tuple(row[0].split(" "))
+            self.touched.add(key)
+            self.hits += 1
+        else:
+            ensure_wordsegment_loaded()
+            words = tuple(wordsegment.segment(key))
+            self.pending[key] = words
+            self.misses += 1
+
+        self.remember(key, words)
+        return list(words)
+
+    #Write new results and LRU timestamps to disk, then evict past max_entries
+    def flush(self):
+        if self.conn is None or (not self.pending and not self.touched):
+            return
+
+        conn = self.connect()
+        now = time.time()
+
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO segments (chunk, words, last_used) VALUES (?, ?, ?)",
+                [(key, " ".join(words), now) for key, words in self.pending.items()]
+            )
+            conn.executemany(
+                "UPDATE segments SET last_used = ? WHERE chunk = ?",
+                [(now, key) for key in self.touched if key not in self.pending]
+            )
+
+            # an upper bound (a replaced row is counted again), the real count decides eviction
+            self.rows += len(self.pending)
+            if self.rows > self.max_entries:
+                self.rows = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+                if self.rows > self.max_entries:
+                    conn.execute(
+                        "DELETE FROM segments WHERE chunk IN "
+                        "(SELECT chunk FROM segments ORDER BY last_used LIMIT ?)",
+                        (self.rows - self.max_entries,)
+                    )
+                    self.rows = self.max_entries
+
+        self.pending.clear()
+        self.touched.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0
+        }
+
+
+segment_cache = SegmentCache()
+
+
+def cached_segment(chunk):
+    return segment_cache.segment(chunk)
+
+
+def report_segment_stats(stats):
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / lookups if lookups else 0
+    print(f"Segment cache: {stats['hits']}/{lookups} hits ({hit_rate:.1%})")
@@ -1,12 +1,14 @@
-
-from rag_engine.converters.extract_classify.classify_model import classify_pdf
+from rag_engine.converters.extract_classify.classify_model import classify_pdf, iter_classify_pdf
+from rag_engine.converters.chunking import chunk_text, get_max_seq_length, truncation_stats
 import json
+import os
 
+# "tokens" splits sections by the embedding model's tokenizer (see chunking.py), "words" every max_words words
+CHUNKER = os.environ.get("CHUNKER", "tokens")
 
-def create_structured_json(pdf_path, output_path="structured.json", max_words=350):
-    classified_lines = classify_pdf(pdf_path)
 
-    structured = []
+#Group classified lines into sections, each one is yielded once the next heading closes it
+def iter_sections(classified_lines):
     current_section = None
 
     for item in classified_lines:
@@ -29,15 +31,16 @@ def create_structured_json(pdf_path, output_path="structured.json", max_words=35
                     current_section["heading"] += " " + text
                     continue
 
-            # Start new section
+            # Start new section, the previous one can't change anymore
+            if current_section is not None:
+                yield current_section
+
             current_section = {
                 "type": "heading",
                 "heading": text,
                 "content": []
             }
 
-            structured.append(current_section)
-
         # PARAGRAPH LOGIC
         elif label == "PARAGRAPH":
 
@@ -47,53 +50,72 @@ def create_structured_json(pdf_path, output_path="structured.json", max_words=35
                     "heading": "INTRO",
                     "content": []
                 }
-                structured.append(current_section)
 
             current_section["content"].append(text)
 
-    # CHUNK SPLITTING BY SIZE
-    final_output = []
+    if current_section is not None:
+        yield current_section
 
-    for section in structured:
-        if not section["content"]:
+
+#Rebuild a section's text from its lines, following the glue hints
+def section_text(section):
+    # Instead of " ".join(), we rebuild the text based on your "glue hints"
+    full_text = ""
+    lines = section["content"]
+
+    for idx, line in enumerate(lines):
+        line = line.strip()
+        if not line:
             continue
 
-        # Instead of " ".join(), we rebuild the text based on your "glue hints"
-        full_text = ""
-        lines = section["content"]
-        
-        for idx, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-                
-            if line.endswith("-"):
-                # Remove the hyphen and add the line WITHOUT a space
-                full_text += line[:-1]
-            else:
-                # Add the line with a space (standard paragraph behavior)
-                full_text += line + (" " if idx < len(lines) - 1 else "")
-        
-        full_text = full_text.strip()
-        #END OF IMPROVED JOINING 
+        if line.endswith("-"):
+            # Remove the hyphen and add the line WITHOUT a space
+            full_text += line[:-1]
+        else:
+            # Add the line with a space (standard paragraph behavior)
+            full_text += line + (" " if idx < len(lines) - 1 else "")
 
+    return full_text.strip()
+
+
+# CHUNK SPLITTING BY SIZE
+#"tokens" (default) packs sentences into chunks that fit the embedding model's window,
+#"words" is the old fixed split every max_words words
+def section_to_chunks(section, max_words=350, chunker=None):
+    full_text = section_text(section)
+
+    if (chunker or CHUNKER) == "tokens":
+        contents = chunk_text(full_text, section["heading"])
+    else:
         words = full_text.split()
-        chunks = []
-        chunk_id = 0
+        contents = [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
+
+    chunks = [
+        {
+            "chunk_id": chunk_id,
+            "content": content
+        }
+        for chunk_id, content in enumerate(contents)
+    ]
+
+    return {
+        "heading": section["heading"],
+        "chunks": chunks
+    }
+
+
+def build_structured_sections(classified_lines, max_words=350, chunker=None):
+    for section in iter_sections(classified_lines):
+        if not section["content"]:
+            continue
+
+        yield section_to_chunks(section, max_words, chunker)
 
-        for i in range(0, len(words), max_words):
-            chunk_text = " ".join(words[i:i + max_words])
 
-            chunks.append({
-                "chunk_id": chunk_id,
-                "content": chunk_text
-            })
-            chunk_id += 1
+def create_structured_json(pdf_path, output_path="structured.json", max_words=350, chunker=None):
+    classified_lines = classify_pdf(pdf_path)
 
-        final_output.append({
-            "heading": section["heading"],
-            "chunks": chunks
-        })
+    final_output = list(build_structured_sections(classified_lines, max_words, chunker))
 
     # SAVE JSON
 
@@ -101,3 +123,49 @@ def create_structured_json(pdf_path, output_path="structured.json", max_words=35
         json.dump(final_output, f, indent=2, ensure_ascii=False)
 
     return final_output
+
+
+#Pass sections through while appending each one as a JSON line, so a persisted copy costs
+#no second pass and no pretty-printing
+def tee_sections_jsonl(sections, output_path):
+    with open(output_path, "w", encoding="utf-8") as f:
+        for section in sections:
+            f.write(json.dumps(section, ensure_ascii=False))
+            f.write("\n")
+            yield section
+
+
+def read_sections_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for row in f:
+            if row.strip():
+                yield json.loads(row)
+
+
+#Streaming version: sections come out while later pages are still being parsed
+def iter_structured_json(pdf_path, max_words=350, chunker=None):
+    classified_lines = (
+        item
+        for page_items in iter_classify_pdf(pdf_path)
+        for item in page_items
+    )
+
+    yield from build_structured_sections(classified_lines, max_words, chunker)
+
+
+#Word-pieces cut off by the embedding model with the word and the token chunker
+def truncation_report(pdf_path):
+    sections = list(iter_sections(classify_pdf(pdf_path)))
+    report = {}
+
+    for chunker in ("words", "tokens"):
+        structured = [section_to_chunks(section, chunker=chunker) for section in sections if section["content"]]
+        report[chunker] = stats = truncation_stats(structured)
+
+        print(
+            f"{chunker:<7} {stats['chunks']:>4} chunks, {stats['truncated_chunks']:>4} over {get_max_seq_length()} tokens, "
+            f"{stats['truncated_tokens']}/{stats['tokens']} tokens truncated "
+            f"({stats['truncated_tokens'] / max(stats['tokens'], 1):.1%})"
+        )
+
+    return report
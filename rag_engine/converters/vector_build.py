@@ -1,40 +1,196 @@
+import hashlib
 import json
+import os
 from chromadb import PersistentClient
-from sentence_transformers import SentenceTransformer
 import time
 
+from rag_engine.converters.chunking import MODEL_NAME, format_chunk
+from rag_engine.embedding_cache import embedding_cache, cached_encode, report_embedding_stats
+from rag_engine.encoder import ENCODER_KEY, INDEX_BATCH_SIZE, encode
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 
-MODEL_NAME = "all-MiniLM-L6-v2"
 COLLECTION_NAME = "documents"
 DB_PATH = "chroma_db"
 
-model = SentenceTransformer(MODEL_NAME)
+# ids passed to a single chroma delete call, rows read per chroma get when scanning the collection
+DELETE_BATCH = 5000
+SCAN_BATCH = 5000
+
+# Bump when document_id / chunk_id change, stored chunks under older ids are then dropped once
+CHUNK_ID_VERSION = 2
+
+# "incremental" embeds only chunks whose text hash isn't stored yet, "full" re-embeds every chunk
+INCREMENTAL_INDEX = os.environ.get("INDEX_MODE", "incremental") == "incremental"
 
 # Build Vector Database
 
-def build_vector_db(json_path):
+#json_path is a structured.json list, or a .jsonl file of one section per line,
+#source is the document it came from. It is required: structured.json is rewritten for
+#every document, so its own path would give every document the same id
+def build_vector_db(json_path, source):
+
+    if json_path.endswith(".jsonl"):
+        from rag_engine.converters.structuring_json import read_sections_jsonl
+        index_sections(read_sections_jsonl(json_path), source=source)
+        return
 
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
+    index_sections(data, source=source)
+
+
+#Stable id of a source document, the same file keeps its id when its content changes.
+#Files inside the repo are keyed by their repo-relative path, so moving the repo keeps every id
+def document_id(source):
+    path = os.path.normcase(os.path.abspath(source))
+    root = os.path.normcase(ROOT_DIR)
+
+    try:
+        if os.path.commonpath([path, root]) == root:
+            path = os.path.relpath(path, root).replace(os.sep, "/")
+    except ValueError:
+        # another drive than the repo (Windows)
+        pass
+
+    return hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+#Chunk id from the document id and the embedded text's hash, the n-th repeat of a text gets a suffix
+def chunk_id(doc_id, digest, seen):
+    seen[digest] = seen.get(digest, 0) + 1
+    return f"{doc_id}-{digest}" if seen[digest] == 1 else f"{doc_id}-{digest}-{seen[digest] - 1}"
+
+
+def get_collection():
     client = PersistentClient(path=DB_PATH)
     collection = client.get_or_create_collection(name=COLLECTION_NAME)
+    migrate_collection(collection)
+    return collection
 
-    # Clear old data
-    existing = collection.get()
-    if existing["ids"]:
-        collection.delete(ids=existing["ids"])
 
-    print("Preparing data...")
+#id -> metadata of every chunk in the collection, read SCAN_BATCH rows at a time
+def all_chunks(collection):
+    chunks = {}
+    offset = 0
+    while True:
+        stored = collection.get(limit=SCAN_BATCH, offset=offset, include=["metadatas"])
+        chunks.update(zip(stored["ids"], stored["metadatas"]))
+        if len(stored["ids"]) < SCAN_BATCH:
+            return chunks
+        offset += SCAN_BATCH
 
-    all_texts = []
-    all_ids = []
-    all_metadatas = []
 
-    for idx, section in enumerate(data):
+#One-time cleanup of chunks no document lookup can find: the "0_0" ids written before chunks
+#were scoped by doc_id, and ids from an older document_id scheme. Their documents are
+#embedded again on their next ingest (mostly from the embedding cache)
+def migrate_collection(collection):
+    if (collection.metadata or {}).get("chunk_id_version") == CHUNK_ID_VERSION:
+        return
+
+    stale_ids = [
+        i for i, metadata in all_chunks(collection).items()
+        if not metadata or "doc_id" not in metadata or "source" not in metadata
+        or metadata["doc_id"] != document_id(metadata["source"])
+    ]
+    if stale_ids:
+        delete_ids(collection, stale_ids)
+        print(f"Removed {len(stale_ids)} chunks stored under older ids, re-ingest their documents to index them again")
+
+    collection.modify(metadata={**(collection.metadata or {}), "chunk_id_version": CHUNK_ID_VERSION})
+
+
+def document_chunk_ids(collection, doc_id):
+    return collection.get(where={"doc_id": doc_id}, include=[])["ids"]
+
+
+#id -> metadata of every chunk stored for a document
+def document_chunks(collection, doc_id):
+    stored = collection.get(where={"doc_id": doc_id}, include=["metadatas"])
+    return dict(zip(stored["ids"], stored["metadatas"]))
+
+
+def delete_ids(collection, ids):
+    for start in range(0, len(ids), DELETE_BATCH):
+        collection.delete(ids=ids[start:start + DELETE_BATCH])
+
+
+#Drop every chunk of one document from the collection
+def remove_document(source):
+    collection = get_collection()
+    ids = document_chunk_ids(collection, document_id(source))
+    delete_ids(collection, ids)
+    print(f"Removed {len(ids)} chunks of {source}")
+
+
+#Drop the chunks of every document whose source file no longer exists (deleted or renamed),
+#returns the removed sources. Relative sources are resolved against the working directory
+def prune_missing_documents(collection=None):
+    collection = collection or get_collection()
+
+    missing = {}
+    for chunk_key, metadata in all_chunks(collection).items():
+        source = (metadata or {}).get("source")
+        if source and not os.path.exists(source):
+            missing.setdefault(source, []).append(chunk_key)
+
+    for source, ids in missing.items():
+        delete_ids(collection, ids)
+        print(f"Removed {len(ids)} chunks of {source}, the file no longer exists")
+
+    return sorted(missing)
+
+
+def store_batch(collection, texts, ids, metadatas):
+
+    # texts embedded by an earlier build (or another document) come from the cache
+    embeddings = cached_encode(
+        texts,
+        lambda missing: encode(missing, batch_size=32, show_progress_bar=len(missing) > 32),
+        ENCODER_KEY
+    )
+
+    collection.upsert(
+        ids=ids,
+        embeddings=embeddings.tolist(),
+        documents=texts,
+        metadatas=metadatas
+    )
+
 
+#Diff of a document's new chunks against the chunks the collection stores for it:
+#which texts need embedding, which only moved, and (once every section was added) which are stale.
+#A stored chunk only counts as unchanged if the same encoder (model + backend) embedded it
+class DocumentDiff:
+
+    def __init__(self, stored, source, doc_id, incremental=True, encoder_key=None):
+        self.stored = stored
+        self.source = source
+        self.doc_id = doc_id
+        self.incremental = incremental
+        self.encoder_key = encoder_key or ENCODER_KEY
+
+        self.moved_ids = []
+        self.moved_metadatas = []
+        # (section, chunk) positions of chunks with a new text
+        self.changed_slots = set()
+        # chunks whose text is unchanged but was embedded by another encoder
+        self.reencoded = 0
+        self.unchanged = 0
+        self.embedded = 0
+        self.seen = {}
+        self.kept_ids = set()
+
+    #(id, text, metadata) of the chunks of section idx that need embedding
+    def add_section(self, idx, section):
         heading = section.get("heading", "UNKNOWN")
         chunks = section.get("chunks", [])
+        to_embed = []
 
         for chunk_idx, chunk in enumerate(chunks):
 
@@ -47,35 +203,137 @@ def build_vector_db(json_path):
             if not isinstance(chunk_text, str) or not chunk_text.strip():
                 continue
 
-            combined_text = f"Section: {heading}\nContent: {chunk_text}"
-            all_texts.append(combined_text)
-            all_ids.append(f"{idx}_{chunk_idx}")
-            all_metadatas.append({"heading": heading})
+            # same template the chunker sized the chunk for
+            combined_text = format_chunk(heading, chunk_text)
+            digest = text_hash(combined_text)
+            chunk_key = chunk_id(self.doc_id, digest, self.seen)
+            metadata = {
+                "heading": heading,
+                "doc_id": self.doc_id,
+                "source": self.source,
+                "section": idx,
+                "chunk": chunk_idx,
+                "content_hash": digest,
+                "encoder": self.encoder_key
+            }
+            self.kept_ids.add(chunk_key)
 
-    print(f"Encoding {len(all_texts)} chunks...")
-    
-    if len(all_texts) == 0:
-        print("No valid text chunks found. Aborting build.")
-        return 
-
-    embeddings = model.encode(
-        all_texts,
-        batch_size=32,
-        show_progress_bar=True
-    )
+            old = self.stored.get(chunk_key)
+            same_text = old is not None and old.get("content_hash", digest) == digest
 
-    print("Storing in Chroma...")
+            if same_text and old.get("encoder") != self.encoder_key:
+                # its vector lives in another embedding space (or has another size), embed it again
+                self.reencoded += 1
+            elif same_text:
+                self.unchanged += 1
 
-    collection.add(
-        ids=all_ids,
-        embeddings=embeddings.tolist(),
-        documents=all_texts,
-        metadatas=all_metadatas
+                if self.incremental:
+                    # same text, at most its position moved: fix the metadata, keep the embedding
+                    if old != metadata:
+                        self.moved_ids.append(chunk_key)
+                        self.moved_metadatas.append(metadata)
+                    continue
+            else:
+                self.changed_slots.add((idx, chunk_idx))
+
+            self.embedded += 1
+            to_embed.append((chunk_key, combined_text, metadata))
+
+        return to_embed
+
+    def stale_ids(self):
+        return [i for i in self.stored if i not in self.kept_ids]
+
+    def counts(self):
+        stale_ids = self.stale_ids()
+
+        # a new text at the position of a removed chunk counts as that chunk being updated
+        stale_slots = {(self.stored[i].get("section"), self.stored[i].get("chunk")) for i in stale_ids}
+        updated = len(self.changed_slots & stale_slots)
+
+        return {
+            "added": len(self.changed_slots) - updated,
+            "updated": updated + self.reencoded,
+            "removed": len(stale_ids) - updated,
+            "unchanged": self.unchanged,
+            "embedded": self.embedded
+        }
+
+
+#Metadata fixes and stale deletes of a finished diff. Stale chunks are removed only after
+#the new ones were written, so searches never see the document missing while it is re-indexed
+def finish_document(collection, diff):
+    if diff.moved_ids:
+        collection.update(ids=diff.moved_ids, metadatas=diff.moved_metadatas)
+
+    delete_ids(collection, diff.stale_ids())
+    return diff.counts()
+
+
+def print_document_summary(source, counts):
+    print(
+        f"{source}: {counts['added']} added, {counts['updated']} updated, "
+        f"{counts['removed']} removed, {counts['unchanged']} unchanged ({counts['embedded']} chunks written)"
     )
 
-    print("Vector DB built successfully.")
+
+#Encode and store one document's sections in batches of flush_size chunks, sections can be
+#a list or a generator that is still parsing later pages (see iter_structured_json).
+#Only this document's chunks are replaced, other documents in the collection stay as they are.
+#In incremental mode a chunk whose text hash is already stored is not embedded again
+def index_sections(sections, source, doc_id=None, flush_size=INDEX_BATCH_SIZE, incremental=None):
+
+    if not source:
+        raise ValueError("index_sections needs the source document path, chunks are scoped by it")
+
+    collection = get_collection()
+
+    doc_id = doc_id or document_id(source)
+    incremental = INCREMENTAL_INDEX if incremental is None else incremental
+
+    print("Preparing data...")
+
+    cache_stats = embedding_cache.stats()
+    diff = DocumentDiff(document_chunks(collection, doc_id), source, doc_id, incremental)
+
+    all_texts = []
+    all_ids = []
+    all_metadatas = []
+
+    for idx, section in enumerate(sections):
+
+        for chunk_key, combined_text, metadata in diff.add_section(idx, section):
+            all_texts.append(combined_text)
+            all_ids.append(chunk_key)
+            all_metadatas.append(metadata)
+
+        if len(all_texts) >= flush_size:
+            print(f"Encoding {len(all_texts)} chunks...")
+            store_batch(collection, all_texts, all_ids, all_metadatas)
+
+            all_texts, all_ids, all_metadatas = [], [], []
+
+    if all_texts:
+        print(f"Encoding {len(all_texts)} chunks...")
+        store_batch(collection, all_texts, all_ids, all_metadatas)
+
+    counts = finish_document(collection, diff)
+
+    if not diff.kept_ids:
+        print(f"No valid text chunks found in {source}, removed {counts['removed']} old chunks.")
+        return counts
+
+    embedding_cache.flush()
+    report_embedding_stats({
+        name: embedding_cache.stats()[name] - cache_stats[name]
+        for name in ("hits", "misses")
+    })
+
+    print_document_summary(source, counts)
     print("Total items in DB:", collection.count())
 
+    return counts
+
 
 
 
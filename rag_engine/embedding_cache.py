@@ -0,0 +1,229 @@
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Bump when the stored vectors change meaning, old cache files are then ignored
+CACHE_VERSION = 1
+
+# On-disk cache shared by vector_build and vector_search, bounded by MAX_ENTRIES rows (LRU)
+CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(ROOT_DIR, ".cache", f"embedding_cache_v{CACHE_VERSION}.sqlite")
+)
+MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# In-process front cache, mostly for repeated search queries
+MEMORY_ENTRIES = 4096
+
+# New vectors and LRU timestamps of hits are written once this many have piled up, the rest
+# at an explicit flush() (end of an indexing run) or at exit: one commit per PENDING_FLUSH searches,
+# not one per new query
+PENDING_FLUSH = 256
+TOUCH_FLUSH = 256
+
+# rows looked up per sqlite query (stays under sqlite's bound-parameter limit)
+LOOKUP_BATCH = 500
+
+
+#The tokenizer ignores whitespace runs, so texts that differ only there share one vector
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+#float32 embeddings keyed by (model name, normalized text hash), a new model name
+#never sees the vectors of another one
+class EmbeddingCache:
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        self.memory = OrderedDict()
+        self.pending = {}
+        self.touched = set()
+
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = None
+        self.conn_pid = None
+
+        # rows on disk as far as this process knows: counted once per connection, then
+        # raised by every flush, and only recounted once it passes max_entries
+        self.rows = 0
+
+        # pipeline threads share one cache, encode_fn itself runs outside the lock
+        self.lock = threading.RLock()
+
+    def connect(self):
+        # opened lazily, and again after a fork: sqlite connections can't cross processes
+        if self.conn is None or self.conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (model, text_hash))"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self.conn.commit()
+
+            self.rows = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self.conn_pid = os.getpid()
+            self.memory.clear()
+            self.pending.clear()
+            self.touched.clear()
+
+        return self.conn
+
+    def remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+
+        if len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def lookup(self, model_name, hashes):
+        conn = self.connect()
+        found = {}
+
+        for start in range(0, len(hashes), LOOKUP_BATCH):
+            batch = hashes[start:start + LOOKUP_BATCH]
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                [model_name, *batch]
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+
+        return found
+
+    #Embeddings of texts as a float32 matrix, encode_fn(list of texts) is called once
+    #for the texts that aren't cached yet
+    def encode(self, texts, encode_fn, model_name):
+        hashes = [text_key(text) for text in texts]
+        vectors = {}
+
+        with self.lock:
+            self.connect()
+
+            for text_hash in hashes:
+                vector = self.memory.get((model_name, text_hash))
+                if vector is not None:
+                    self.memory.move_to_end((model_name, text_hash))
+                else:
+                    # a vector not written yet may have left the front cache already
+                    vector = self.pending.get((model_name, text_hash))
+                if vector is not None:
+                    vectors[text_hash] = vector
+
+            missing = [text_hash for text_hash in dict.fromkeys(hashes) if text_hash not in vectors]
+            if missing:
+                vectors.update(self.lookup(model_name, missing))
+
+        # one encode call for every distinct text that is still missing
+        to_encode = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in vectors and text_hash not in to_encode:
+                to_encode[text_hash] = normalize_text(text)
+
+        encoded = []
+        if to_encode:
+            encoded = np.asarray(encode_fn(list(to_encode.values())), dtype=np.float32)
+
+        with self.lock:
+            for text_hash, vector in zip(to_encode, encoded):
+                vectors[text_hash] = vector
+                self.pending[(model_name, text_hash)] = vector
+
+            for text_hash in hashes:
+                key = (model_name, text_hash)
+                if text_hash in to_encode:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self.touched.add(key)
+                self.remember(key, vectors[text_hash])
+
+            if len(self.pending) >= PENDING_FLUSH or len(self.touched) >= TOUCH_FLUSH:
+                self.write()
+
+        if not hashes:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([vectors[text_hash] for text_hash in hashes])
+
+    #Write new vectors and LRU timestamps to disk, then evict past max_entries
+    def flush(self):
+        with self.lock:
+            if self.conn is None or (not self.pending and not self.touched):
+                return
+            self.write()
+
+    def write(self):
+        conn = self.connect()
+        now = time.time()
+
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model, text_hash, vector.tobytes(), now) for (model, text_hash), vector in self.pending.items()]
+            )
+            conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, text_hash) for model, text_hash in self.touched if (model, text_hash) not in self.pending]
+            )
+
+            # an upper bound (a replaced row is counted again), the real count decides eviction
+            self.rows += len(self.pending)
+            if self.rows > self.max_entries:
+                self.rows = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                if self.rows > self.max_entries:
+                    conn.execute(
+                        "DELETE FROM embeddings WHERE rowid IN "
+                        "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (self.rows - self.max_entries,)
+                    )
+                    self.rows = self.max_entries
+
+        self.pending.clear()
+        self.touched.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0
+        }
+
+
+embedding_cache = EmbeddingCache()
+
+# searches never flush on their own, whatever is still pending is written when the process ends
+atexit.register(embedding_cache.flush)
+
+
+def cached_encode(texts, encode_fn, model_name):
+    return embedding_cache.encode(texts, encode_fn, model_name)
+
+
+def report_embedding_stats(stats):
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / lookups if lookups else 0
+    print(f"Embedding cache: {stats['hits']}/{lookups} hits ({hit_rate:.1%}), {stats['misses']} encoded")
@@ -0,0 +1,216 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rag_engine.converters.chunking import MODEL_NAME
+
+# "torch" runs the sentence-transformers model, "onnx" / "onnx-int8" run its ONNX export
+# (fp32 / int8-quantized) through onnxruntime without loading torch (see onnx_encoder.py)
+ENCODER_BACKEND = os.environ.get("ENCODER_BACKEND", "torch")
+
+# embedding cache key, vectors of different backends differ slightly and are kept apart
+ENCODER_KEY = MODEL_NAME if ENCODER_BACKEND == "torch" else f"{MODEL_NAME}:{ENCODER_BACKEND}"
+
+ENCODE_BATCH_SIZE = 32
+
+# Encoder processes for large encode calls (1 = encode in this process) and threads
+# per process (0 = split the cores evenly between the processes)
+ENCODE_WORKERS = int(os.environ.get("ENCODE_WORKERS", "1"))
+ENCODE_THREADS = int(os.environ.get("ENCODE_THREADS", "0"))
+
+# calls with fewer texts skip the pool, shipping them to a worker costs more than it saves
+POOL_MIN_TEXTS = 256
+
+# up to a few shards per worker so a slow shard doesn't leave the other workers idle, but
+# never under MIN_SHARD_TEXTS texts: smaller shards are mostly IPC and per-call overhead
+SHARDS_PER_WORKER = 4
+MIN_SHARD_TEXTS = 64
+
+# texts the indexer (vector_build, pipeline) hands to encode at once, with a pool it is
+# raised so every worker gets full shards
+INDEX_BATCH_SIZE = 256 if ENCODE_WORKERS <= 1 else max(256, ENCODE_WORKERS * SHARDS_PER_WORKER * MIN_SHARD_TEXTS)
+
+model = None
+pool = None
+pool_workers = 0
+
+# the pipeline's embed threads share the pool: starting, replacing and closing it, and
+# submitting shards to it, happen under this lock
+pool_lock = threading.RLock()
+
+
+#Load the embedding model on first use instead of at import, anything with
+#SentenceTransformer's encode(texts, batch_size, show_progress_bar, convert_to_numpy)
+def get_model(threads=0):
+    global model
+
+    if model is None:
+        model = load_encoder(ENCODER_BACKEND, threads)
+
+    return model
+
+
+def load_encoder(backend, threads=0):
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(MODEL_NAME)
+
+    if backend in ("onnx", "onnx-int8"):
+        from rag_engine.onnx_encoder import OnnxEncoder
+        return OnnxEncoder.load(quantized=backend == "onnx-int8", threads=threads)
+
+    raise ValueError(f"Unknown encoder backend: {backend}")
+
+
+def worker_threads(workers, threads=None):
+    threads = threads or ENCODE_THREADS
+    return threads or max(1, (os.cpu_count() or 1) // workers)
+
+
+#Runs once in every pool process: pin its threads and load its own model copy
+def init_encoder_worker(threads):
+    if ENCODER_BACKEND == "torch":
+        import torch
+        torch.set_num_threads(threads)
+    get_model(threads)
+
+
+def encode_shard(texts, batch_size):
+    return get_model().encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+
+def get_pool(workers, threads=None):
+    global pool, pool_workers
+
+    with pool_lock:
+        if pool is None or pool_workers != workers:
+            close_pool()
+
+            # spawn, forking a process that already runs torch's thread pool can deadlock
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_encoder_worker,
+                initargs=(worker_threads(workers, threads),)
+            )
+            pool_workers = workers
+
+        return pool
+
+
+#shutdown waits for shards already submitted, a caller that got the pool still gets its results
+def close_pool():
+    global pool, pool_workers
+
+    with pool_lock:
+        if pool is not None:
+            pool.shutdown()
+            pool = None
+            pool_workers = 0
+
+
+#Split texts into at most workers * SHARDS_PER_WORKER shards of at least MIN_SHARD_TEXTS
+def shard_texts(texts, workers):
+    shard_size = max(MIN_SHARD_TEXTS, -(-len(texts) // (workers * SHARDS_PER_WORKER)))
+    return [texts[start:start + shard_size] for start in range(0, len(texts), shard_size)]
+
+
+#Embeddings of texts in order, sharded across ENCODE_WORKERS processes for large calls
+def encode(texts, batch_size=ENCODE_BATCH_SIZE, show_progress_bar=False, workers=None, threads=None):
+    workers = workers or ENCODE_WORKERS
+
+    if workers <= 1 or len(texts) < POOL_MIN_TEXTS:
+        return get_model().encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar, convert_to_numpy=True)
+
+    shards = shard_texts(texts, workers)
+
+    # map submits every shard right away, so no other thread can close the pool in between;
+    # it hands the results back in shard order
+    with pool_lock:
+        results = get_pool(workers, threads).map(encode_shard, shards, [batch_size] * len(shards))
+    return np.concatenate(list(results))
+
+
+#Embeddings/sec of the given worker counts on texts, every run is checked against the
+#single-process embeddings so reordering or a broken shard shows up
+def benchmark_encoder(texts, worker_counts=(1, 2, 4), threads=None, repeats=2):
+    reference = None
+
+    print(f"{'workers':>7} {'threads':>7} {'emb/sec':>9} {'same order':>10}")
+    for workers in worker_counts:
+        # warm-up call starts the pool and loads the model in every worker
+        encode(texts[:POOL_MIN_TEXTS], workers=workers, threads=threads)
+
+        best = float("inf")
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            embeddings = encode(texts, workers=workers, threads=threads)
+            best = min(best, time.perf_counter() - start_time)
+
+        if reference is None:
+            reference = embeddings
+        same = embeddings.shape == reference.shape and np.allclose(embeddings, reference, atol=1e-5)
+
+        threads_used = worker_threads(workers, threads) if workers > 1 else "torch"
+        print(f"{workers:>7} {threads_used:>7} {len(texts) / best:>9.1f} {str(same):>10}")
+
+    close_pool()
+
+
+#Runs in a fresh process per backend so imports and RSS of one backend don't leak into another
+def measure_backend(backend, texts, queries, batch_size):
+    from rag_engine.converters.extract_classify.memory_guard import current_rss_mb
+
+    rss_before = current_rss_mb()
+    start_time = time.perf_counter()
+    encoder = load_encoder(backend)
+    encoder.encode(queries[:1])
+    load_seconds = time.perf_counter() - start_time
+
+    latencies = []
+    for query in queries:
+        start_time = time.perf_counter()
+        encoder.encode([query])
+        latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    embeddings = encoder.encode(texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "embeddings": np.asarray(embeddings, dtype=np.float32),
+        "load_seconds": load_seconds,
+        "query_ms": float(np.median(latencies)) * 1000,
+        "per_sec": len(texts) / elapsed,
+        "rss_mb": current_rss_mb() - rss_before,
+        "torch_loaded": "torch" in sys.modules
+    }
+
+
+#Latency, throughput, RSS and cosine agreement with the torch embeddings for every backend
+def compare_encoders(texts, queries, backends=("torch", "onnx", "onnx-int8"), batch_size=ENCODE_BATCH_SIZE):
+    results = {}
+    for backend in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as worker:
+            results[backend] = worker.submit(measure_backend, backend, texts, queries, batch_size).result()
+
+    reference = results[backends[0]]["embeddings"]
+
+    print(f"{'backend':<10} {'load s':>7} {'query ms':>9} {'emb/sec':>8} {'RSS MB':>7} {'torch':>6} {'min cos':>8} {'mean cos':>9}")
+    for backend, result in results.items():
+        # embeddings are L2-normalized, so the row-wise dot product is the cosine
+        cosine = np.sum(result["embeddings"] * reference, axis=1)
+        result["min_cosine"] = float(cosine.min())
+        result["mean_cosine"] = float(cosine.mean())
+
+        print(
+            f"{backend:<10} {result['load_seconds']:>7.2f} {result['query_ms']:>9.1f} {result['per_sec']:>8.1f} "
+            f"{result['rss_mb']:>7.0f} {str(result['torch_loaded']):>6} {result['min_cosine']:>8.4f} {result['mean_cosine']:>9.4f}"
+        )
+
+    return results
@@ -0,0 +1,45 @@
+import os
+import time
+
+from rag_engine.converters.extract_classify.classify_model import classify_pdf
+from rag_engine.converters.structuring_json import build_structured_sections, iter_structured_json, tee_sections_jsonl
+from rag_engine.converters.vector_build import index_sections
+
+# stream sections into the vector db while later pages are still parsed
+STREAM_INGESTION = os.environ.get("STREAM_INGESTION") == "1"
+
+# directory for a JSONL copy of every document's sections, empty = keep them in memory only
+PERSIST_DIR = os.environ.get("PERSIST_SECTIONS_DIR", "")
+
+
+def document_sections(file_path, stream=None):
+    stream = STREAM_INGESTION if stream is None else stream
+
+    if stream:
+        return iter_structured_json(file_path)
+    return build_structured_sections(classify_pdf(file_path))
+
+
+#Sections also written to <persist_dir>/<name>.sections.jsonl as they pass,
+#that file can be re-indexed later with build_vector_db(path, file_path)
+def persist_sections(sections, file_path, persist_dir):
+    os.makedirs(persist_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return tee_sections_jsonl(sections, os.path.join(persist_dir, f"{name}.sections.jsonl"))
+
+
+#Structure a document and hand its sections straight to the embedder, no structured.json
+#round trip. With persist_dir the sections are also kept as JSONL (persist_sections)
+def ingest_document(file_path, stream=None, persist_dir=None):
+    start_time = time.time()
+    persist_dir = PERSIST_DIR if persist_dir is None else persist_dir
+
+    sections = document_sections(file_path, stream)
+
+    if persist_dir:
+        sections = persist_sections(sections, file_path, persist_dir)
+
+    # chunks are scoped to this file, re-ingesting it replaces only its own vectors
+    index_sections(sections, source=file_path)
+
+    print(f"Ingested {os.path.basename(file_path)} in {time.time() - start_time:.2f}s")
@@ -0,0 +1,132 @@
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from rag_engine.converters.chunking import MODEL_NAME, get_max_seq_length, get_tokenizer
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Exported copies of the embedding model, one directory per model name
+ONNX_CACHE_DIR = os.environ.get("ONNX_CACHE_DIR", os.path.join(ROOT_DIR, ".cache", "onnx"))
+
+ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+# Bump when the export settings change, older exports are then rebuilt
+ONNX_FORMAT = 1
+ONNX_OPSET = 17
+
+
+def onnx_dir(model_name=MODEL_NAME):
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", os.path.abspath(model_name) if os.path.isdir(model_name) else model_name)
+    return os.path.join(ONNX_CACHE_DIR, f"{name.strip('_')}.v{ONNX_FORMAT}")
+
+
+#Export the transformer of the sentence-transformers model to ONNX (fp32, plus a dynamically
+#int8-quantized copy). Pooling and normalization stay outside the graph, see OnnxEncoder.
+#Needs torch and onnx, serving the exported files only needs onnxruntime
+def export_onnx(model_name=MODEL_NAME, out_dir=None):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    out_dir = out_dir or onnx_dir(model_name)
+    transformer = SentenceTransformer(model_name, device="cpu")[0].auto_model.eval()
+    sample = get_tokenizer()(["export sample", "a second, longer export sample"], padding=True, return_tensors="pt")
+
+    # build next to the target and rename so a reader never sees half an export
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".onnx_")
+
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in ONNX_INPUTS + ("last_hidden_state",)}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in ONNX_INPUTS),
+            os.path.join(tmp_dir, "model.onnx"),
+            input_names=list(ONNX_INPUTS),
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            dynamo=False
+        )
+
+    # tokenizer.json lets the encoder tokenize with the tokenizers library alone
+    get_tokenizer().save_pretrained(tmp_dir)
+
+    # int8 weights for the MatMul/Gemm layers, activations are quantized on the fly
+    quantize_dynamic(
+        os.path.join(tmp_dir, "model.onnx"),
+        os.path.join(tmp_dir, "model.int8.onnx"),
+        weight_type=QuantType.QInt8
+    )
+
+    try:
+        os.rename(tmp_dir, out_dir)
+    except OSError:
+        # another process exported the same model first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return out_dir
+
+
+#all-MiniLM-L6-v2 through onnxruntime: same tokenizer, truncation, mean pooling and
+#L2 normalization as its sentence-transformers pipeline, without importing torch
+class OnnxEncoder:
+
+    def __init__(self, model_path, threads=0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+        # transformers' AutoTokenizer would import torch, the plain tokenizers library doesn't
+        self.tokenizer = Tokenizer.from_file(os.path.join(os.path.dirname(model_path), "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=get_max_seq_length())
+        self.tokenizer.enable_padding()
+
+    @classmethod
+    def load(cls, quantized=False, threads=0, model_name=MODEL_NAME):
+        model_dir = onnx_dir(model_name)
+        if not os.path.exists(os.path.join(model_dir, "model.int8.onnx")):
+            export_onnx(model_name, model_dir)
+
+        return cls(os.path.join(model_dir, "model.int8.onnx" if quantized else "model.onnx"), threads)
+
+    # same signature as SentenceTransformer.encode for the arguments the pipeline uses
+    def encode(self, texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        embeddings = np.empty((len(texts), 0), dtype=np.float32)
+
+        # longest first like sentence-transformers, so each batch pads to similar lengths
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            encoded = self.tokenizer.encode_batch([texts[i] for i in batch])
+            inputs = {
+                "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encoded], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encoded], dtype=np.int64)
+            }
+            feeds = {name: inputs[name] for name in self.input_names}
+            hidden = self.session.run(["last_hidden_state"], feeds)[0]
+
+            mask = inputs["attention_mask"][:, :, np.newaxis].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+            if not embeddings.shape[1]:
+                embeddings = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            embeddings[batch] = pooled
+
+        return embeddings[0] if single else embeddings
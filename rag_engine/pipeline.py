@@ -0,0 +1,298 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from rag_engine.converters.extract_classify.classify_model import classify_pdf
+from rag_engine.converters.structuring_json import build_structured_sections
+from rag_engine.converters.vector_build import (
+    INCREMENTAL_INDEX, DocumentDiff, document_chunks, document_id, finish_document,
+    get_collection, print_document_summary
+)
+from rag_engine.embedding_cache import cached_encode, embedding_cache
+from rag_engine.encoder import ENCODER_KEY, INDEX_BATCH_SIZE, encode
+from rag_engine.ingest import PERSIST_DIR, STREAM_INGESTION, persist_sections
+
+# Documents parsed (extract -> classify -> structure) at once, each in its own process.
+# 0 parses in a thread of this process: no worker start-up (imports, classifier and
+# tokenizer loads), the better choice on one or two cores
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "1" if (os.cpu_count() or 1) > 2 else "0"))
+
+# Threads embedding chunk batches, torch and onnxruntime release the GIL while they compute
+EMBED_WORKERS = int(os.environ.get("EMBED_WORKERS", "1"))
+
+# Items a queue holds before its producer waits: parsed documents, embedded batches
+QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "4"))
+
+# chunks per encode call (raised with ENCODE_WORKERS, see encoder.py), and rows per
+# collection.upsert in the writer
+EMBED_BATCH = INDEX_BATCH_SIZE
+WRITE_BATCH = 1024
+
+# ends a stage's input, one per worker
+DONE = None
+
+
+#Busy time, item count and queue depth seen by one stage
+class StageStats:
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.depth_max = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds, items=1):
+        with self.lock:
+            self.busy += seconds
+            self.items += items
+
+    #Depth of the stage's input queue, sampled every time the stage takes an item
+    def sample(self, input_queue):
+        depth = input_queue.qsize()
+        with self.lock:
+            self.depth_samples += 1
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+
+#Runs in a parse worker process, with persist_dir the sections are also kept as JSONL
+def parse_document(file_path, persist_dir=""):
+    sections = build_structured_sections(classify_pdf(file_path))
+    if persist_dir:
+        sections = persist_sections(sections, file_path, persist_dir)
+    return list(sections)
+
+
+#Extract/classify/structure stage: PARSE_WORKERS threads, each keeping one pool process busy
+#(without a pool the thread parses itself)
+def parse_stage(pool, paths, parsed, stats, persist_dir, errors, stop):
+    while not stop.is_set():
+        try:
+            file_path = paths.get_nowait()
+        except queue.Empty:
+            return
+
+        start_time = time.perf_counter()
+        try:
+            if pool:
+                sections = pool.submit(parse_document, file_path, persist_dir).result()
+            else:
+                sections = parse_document(file_path, persist_dir)
+        except Exception as e:
+            errors.append((file_path, e))
+            print(f"Failed to parse {file_path}: {e}")
+            continue
+        stats.record(time.perf_counter() - start_time)
+
+        parsed.put((file_path, sections))
+
+
+#Embedding stage: diff a parsed document against the collection and embed what changed,
+#batches go to the writer followed by the finished diff
+def embed_stage(collection, parsed, written, stats, incremental, errors, stop):
+    while True:
+        stats.sample(parsed)
+        item = parsed.get()
+        if item is DONE:
+            return
+
+        # keep taking documents after a writer failure so the parsers never block on a full queue
+        if stop.is_set():
+            continue
+
+        file_path, sections = item
+        start_time = time.perf_counter()
+
+        try:
+            doc_id = document_id(file_path)
+            diff = DocumentDiff(document_chunks(collection, doc_id), file_path, doc_id, incremental)
+            to_embed = [chunk for idx, section in enumerate(sections) for chunk in diff.add_section(idx, section)]
+
+            busy = time.perf_counter() - start_time
+            for start in range(0, len(to_embed), EMBED_BATCH):
+                if stop.is_set():
+                    break
+                batch = to_embed[start:start + EMBED_BATCH]
+
+                start_time = time.perf_counter()
+                embeddings = cached_encode([text for _, text, _ in batch], encode, ENCODER_KEY)
+                busy += time.perf_counter() - start_time
+
+                # time spent waiting on a full writer queue is not this stage's work
+                written.put(("batch", batch, embeddings))
+        except Exception as e:
+            # batches already sent are stored, the document's stale chunks stay until it is re-ingested
+            errors.append((file_path, e))
+            print(f"Failed to embed {file_path}: {e}")
+            continue
+
+        stats.record(busy, len(to_embed))
+        written.put(("document", diff, None))
+
+
+#Single writer: every chroma write goes through here, upserts of consecutive batches
+#(across documents) are combined into WRITE_BATCH-row calls. A failed write stops the
+#other stages, the writer keeps draining its queue until they have finished
+def write_stage(collection, written, stats, embed_workers, summaries, failures, stop):
+    ids, texts, metadatas, embeddings = [], [], [], []
+    finished_workers = 0
+
+    def flush():
+        if ids:
+            collection.upsert(ids=ids[:], embeddings=embeddings[:], documents=texts[:], metadatas=metadatas[:])
+            ids.clear(); texts.clear(); metadatas.clear(); embeddings.clear()
+
+    def fail(e):
+        failures.append(e)
+        stop.set()
+        print(f"Pipeline writer failed: {e}")
+
+    while finished_workers < embed_workers:
+        stats.sample(written)
+        item = written.get()
+        if item is DONE:
+            finished_workers += 1
+            continue
+
+        if failures:
+            continue
+
+        kind, payload, vectors = item
+        start_time = time.perf_counter()
+
+        try:
+            if kind == "batch":
+                for (chunk_key, text, metadata), vector in zip(payload, vectors):
+                    ids.append(chunk_key)
+                    texts.append(text)
+                    metadatas.append(metadata)
+                    embeddings.append(vector.tolist())
+                if len(ids) >= WRITE_BATCH:
+                    flush()
+                stats.record(time.perf_counter() - start_time, len(payload))
+            else:
+                # the document's new chunks have to be stored before its stale ones are deleted
+                flush()
+                counts = finish_document(collection, payload)
+                summaries[payload.source] = counts
+                print_document_summary(payload.source, counts)
+                stats.record(time.perf_counter() - start_time, 0)
+        except Exception as e:
+            fail(e)
+
+    if not failures:
+        try:
+            flush()
+        except Exception as e:
+            fail(e)
+
+
+#Ingest documents through three overlapped stages joined by bounded queues:
+#parse (PARSE_WORKERS processes) -> embed (EMBED_WORKERS threads) -> one chroma writer.
+#A document that fails to parse or embed is reported and skipped, a failed write is raised.
+#PERSIST_SECTIONS_DIR is honoured like in ingest_document
+def run_pipeline(file_paths, parse_workers=None, embed_workers=None, queue_size=None, incremental=None,
+                 persist_dir=None):
+    parse_workers = PARSE_WORKERS if parse_workers is None else parse_workers
+    embed_workers = embed_workers or EMBED_WORKERS
+    queue_size = queue_size or QUEUE_SIZE
+    incremental = INCREMENTAL_INDEX if incremental is None else incremental
+    persist_dir = PERSIST_DIR if persist_dir is None else persist_dir
+
+    if STREAM_INGESTION:
+        # a parsed document crosses a process boundary as a whole, the overlap is across documents
+        print("Warning: STREAM_INGESTION is ignored by the pipeline, use INGEST_MODE=sequential to stream")
+
+    collection = get_collection()
+    start_time = time.perf_counter()
+
+    paths = queue.Queue()
+    for file_path in file_paths:
+        paths.put(file_path)
+    parsed = queue.Queue(maxsize=queue_size)
+    written = queue.Queue(maxsize=queue_size)
+
+    stats = {
+        "parse": StageStats("parse", max(parse_workers, 1)),
+        "embed": StageStats("embed", embed_workers),
+        "write": StageStats("write", 1)
+    }
+    errors = []
+    failures = []
+    summaries = {}
+    stop = threading.Event()
+
+    pool = None
+    if parse_workers:
+        # spawn, the embed thread may be inside torch when the pool starts a process
+        pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    try:
+        parsers = [
+            threading.Thread(target=parse_stage, args=(pool, paths, parsed, stats["parse"], persist_dir, errors, stop))
+            for _ in range(max(parse_workers, 1))
+        ]
+        embedders = [
+            threading.Thread(target=embed_stage, args=(collection, parsed, written, stats["embed"], incremental, errors, stop))
+            for _ in range(embed_workers)
+        ]
+        writer = threading.Thread(
+            target=write_stage,
+            args=(collection, written, stats["write"], embed_workers, summaries, failures, stop)
+        )
+
+        for thread in parsers + embedders + [writer]:
+            thread.start()
+
+        for thread in parsers:
+            thread.join()
+        for _ in embedders:
+            parsed.put(DONE)
+        for thread in embedders:
+            thread.join()
+        for _ in embedders:
+            written.put(DONE)
+        writer.join()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # the last batches' vectors are still pending, the cache only writes every PENDING_FLUSH
+    embedding_cache.flush()
+
+    if failures:
+        raise failures[0]
+
+    elapsed = time.perf_counter() - start_time
+    report_pipeline(stats, elapsed, len(file_paths))
+    print("Total items in DB:", collection.count())
+
+    if errors:
+        print(f"{len(errors)} document(s) failed: " + ", ".join(os.path.basename(path) for path, _ in errors))
+
+    return {"stats": stats, "elapsed": elapsed, "summaries": summaries, "errors": errors}
+
+
+#Per-stage throughput and input queue depth, the busiest stage is the bottleneck
+def report_pipeline(stats, elapsed, documents):
+    print(f"\nPipeline: {documents} documents in {elapsed:.2f}s")
+    print(f"{'stage':<6} {'workers':>7} {'items':>6} {'busy s':>7} {'items/s':>8} {'util':>6} {'avg queue':>9} {'max queue':>9}")
+
+    for stage in stats.values():
+        utilization = stage.busy / (elapsed * stage.workers) if elapsed else 0
+        rate = stage.items / stage.busy if stage.busy else 0
+        average_depth = stage.depth_total / stage.depth_samples if stage.depth_samples else 0
+        print(
+            f"{stage.name:<6} {stage.workers:>7} {stage.items:>6} {stage.busy:>7.2f} {rate:>8.1f} "
+            f"{utilization:>6.0%} {average_depth:>9.1f} {stage.depth_max:>9}"
+        )
+
+    bottleneck = max(stats.values(), key=lambda stage: stage.busy / stage.workers)
+    print(f"Bottleneck: {bottleneck.name}")
@@ -1,16 +1,17 @@
 import json
 from chromadb import PersistentClient
-from sentence_transformers import SentenceTransformer
 import time
 
 from rag_engine.converters.vector_build import MODEL_NAME, COLLECTION_NAME, DB_PATH
+from rag_engine.embedding_cache import cached_encode
+from rag_engine.encoder import ENCODER_KEY, encode, get_model
 
 
 print("--- Loading Resources into RAM ---")
 start_load = time.time()
 
 # Load model once globally
-model = SentenceTransformer(MODEL_NAME)
+get_model()
 
 # Load Chroma once globally (PersistentClient caches the index in RAM while running)
 client = PersistentClient(path=DB_PATH)
@@ -22,8 +23,8 @@ def fast_search(query, top_k=3):
     """Search function using the globally loaded model and collection."""
     start_time = time.time()
     
-    # 1. Encode query
-    query_embedding = model.encode(query).tolist()
+    # 1. Encode query (repeated queries come from the shared embedding cache)
+    query_embedding = cached_encode([query], encode, ENCODER_KEY)[0].tolist()
     
     # 2. Query vector DB
     results = collection.query(
@@ -0,0 +1,56 @@
+import hashlib
+import os
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SAMPLE_PDF = os.path.join(ROOT_DIR, "test.pdf")
+
+# caches go to a scratch directory instead of the repo's .cache, and nothing is
+# downloaded from the hub (set before any rag_engine module reads them)
+CACHE_DIR = tempfile.mkdtemp(prefix="rag_engine_tests_")
+os.environ.setdefault("SEGMENT_CACHE_PATH", os.path.join(CACHE_DIR, "segments.sqlite"))
+os.environ.setdefault("DOC_CACHE_DIR", os.path.join(CACHE_DIR, "documents"))
+os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(CACHE_DIR, "embeddings.sqlite"))
+os.environ.setdefault("FOREST_CACHE_DIR", os.path.join(CACHE_DIR, "forest"))
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+
+@pytest.fixture(scope="session")
+def sample_pdf():
+    return SAMPLE_PDF
+
+
+def hash_vector(text):
+    return np.frombuffer(hashlib.sha256(text.encode("utf-8")).digest()[:32], dtype=np.uint8).astype(np.float32)
+
+
+#In-memory chroma collection behind vector_build, a hash "encoder" that records what it
+#was asked to embed, a scratch embedding cache and the approximate tokenizer
+@pytest.fixture
+def vector_db(monkeypatch, tmp_path):
+    import chromadb
+
+    from rag_engine import embedding_cache as cache_module
+    from rag_engine.converters import chunking, vector_build
+
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"test-{uuid.uuid4().hex}")
+    cache = cache_module.EmbeddingCache(path=str(tmp_path / "embeddings.sqlite"))
+    db = SimpleNamespace(collection=collection, encoded=[])
+
+    def encode(texts, **kwargs):
+        db.encoded.extend(texts)
+        return np.stack([hash_vector(text) for text in texts])
+
+    monkeypatch.setattr(vector_build, "get_collection", lambda: collection)
+    monkeypatch.setattr(vector_build, "encode", encode)
+    monkeypatch.setattr(vector_build, "embedding_cache", cache)
+    monkeypatch.setattr(cache_module, "embedding_cache", cache)
+    monkeypatch.setattr(chunking, "tokenizer", chunking.ApproximateTokenizer())
+
+    db.encode = encode
+    return db
@@ -0,0 +1,95 @@
+import pytest
+
+from rag_engine.converters import chunking
+from rag_engine.converters.chunking import ApproximateTokenizer, chunk_text, count_tokens, format_chunk
+
+PROSE = " ".join(
+    f"Sentence number {i} talks about section layout, headings and paragraphs in a document." for i in range(60)
+)
+
+
+@pytest.fixture(autouse=True)
+def approximate_tokenizer(monkeypatch):
+    # the hub is unreachable in tests, pin the fallback so results don't depend on a local cache
+    monkeypatch.setattr(chunking, "tokenizer", ApproximateTokenizer())
+
+
+def window_tokens(heading, chunks):
+    return [count_tokens(format_chunk(heading, chunk)) for chunk in chunks]
+
+
+def test_chunks_fit_the_window():
+    chunks = chunk_text(PROSE, "Layout", max_seq_length=64, overlap=8)
+
+    assert len(chunks) > 1
+    assert max(window_tokens("Layout", chunks)) <= 64
+
+
+def test_chunks_cover_every_word_in_order():
+    chunks = chunk_text(PROSE, "Layout", max_seq_length=64, overlap=0)
+
+    assert " ".join(chunks).split() == PROSE.split()
+
+
+def test_overlap_repeats_the_end_of_the_previous_chunk():
+    chunks = chunk_text(PROSE, "Layout", max_seq_length=64, overlap=8)
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.split()[-1] in chunk.split()[:8]
+
+
+def test_word_longer_than_the_window_is_split_not_dropped():
+    url = "https://example.com/" + "segment/" * 200
+    text = f"See {url} for details."
+
+    chunks = chunk_text(text, "Links", max_seq_length=48, overlap=0)
+
+    assert max(window_tokens("Links", chunks)) <= 48
+    assert "".join("".join(chunks).split()) == "".join(text.split())
+
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("   ", "Empty") == []
+
+
+def test_tokenizer_falls_back_when_it_cannot_be_loaded(monkeypatch):
+    monkeypatch.setattr(chunking, "tokenizer", None)
+    monkeypatch.setattr(chunking, "TOKENIZER_NAME", "/nonexistent/tokenizer")
+
+    assert isinstance(chunking.get_tokenizer(), ApproximateTokenizer)
+    assert count_tokens("the cat") == 4
+
+
+@pytest.fixture
+def unresolved_window(monkeypatch, tmp_path):
+    monkeypatch.setattr(chunking, "max_seq_length", None)
+    monkeypatch.setattr(chunking, "MAX_SEQ_LENGTH", 0)
+    # a model directory without a sentence-transformers config
+    monkeypatch.setattr(chunking, "MODEL_REPO", str(tmp_path))
+    return tmp_path
+
+
+def test_window_comes_from_the_sentence_transformers_config(unresolved_window):
+    (unresolved_window / "sentence_bert_config.json").write_text('{"max_seq_length": 128}')
+
+    assert chunking.get_max_seq_length() == 128
+    assert max(window_tokens("Layout", chunk_text(PROSE, "Layout"))) <= 128
+
+
+def test_window_comes_from_the_tokenizer_without_a_config(unresolved_window, monkeypatch):
+    tokenizer = ApproximateTokenizer()
+    tokenizer.model_max_length = 512
+    monkeypatch.setattr(chunking, "tokenizer", tokenizer)
+
+    assert chunking.get_max_seq_length() == 512
+
+
+def test_window_setting_wins(unresolved_window, monkeypatch):
+    (unresolved_window / "sentence_bert_config.json").write_text('{"max_seq_length": 128}')
+    monkeypatch.setattr(chunking, "MAX_SEQ_LENGTH", 64)
+
+    assert chunking.get_max_seq_length() == 64
+
+
+def test_approximate_tokenizer_falls_back_to_the_default_window(unresolved_window):
+    assert chunking.get_max_seq_length() == chunking.DEFAULT_MAX_SEQ_LENGTH
@@ -0,0 +1,142 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from rag_engine.converters.extract_classify import classify_model, doc_cache
+from rag_engine.converters.extract_classify.features import FEATURE_ORDER
+from rag_engine.converters.extract_classify.forest import FlatForest
+
+
+def test_flat_engine_serves_the_repo_forest(monkeypatch):
+    monkeypatch.setattr(classify_model, "model", None)
+    monkeypatch.setattr(classify_model, "CLASSIFIER_ENGINE", "flat")
+
+    model, inv_label_map = classify_model.get_model()
+
+    assert isinstance(model, FlatForest)
+    assert set(inv_label_map.values()) == {"PARAGRAPH", "HEADING"}
+
+
+def test_non_forest_artifact_is_loaded_once(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.random((50, len(FEATURE_ORDER)))
+    y = (X[:, 0] > 0.5).astype(int)
+
+    model_path = str(tmp_path / "distilled.joblib")
+    joblib.dump({
+        "model": LogisticRegression().fit(X, y),
+        "label_map": {"PARAGRAPH": 0, "HEADING": 1},
+        "feature_order": FEATURE_ORDER
+    }, model_path)
+
+    loads = []
+    real_load = joblib.load
+    monkeypatch.setattr(joblib, "load", lambda path, *args, **kwargs: loads.append(path) or real_load(path, *args, **kwargs))
+    monkeypatch.setattr(classify_model, "model", None)
+    monkeypatch.setattr(classify_model, "CLASSIFIER_ENGINE", "flat")
+    monkeypatch.setattr(classify_model, "MODEL_PATH", model_path)
+
+    model, _ = classify_model.get_model()
+
+    assert isinstance(model, LogisticRegression)
+    assert loads == [model_path]
+
+
+@pytest.fixture
+def doc_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(doc_cache, "CACHE_DIR", str(tmp_path / "documents"))
+    return tmp_path / "documents"
+
+
+#test.pdf and a two-page copy of its first pages
+@pytest.fixture
+def documents(sample_pdf, tmp_path, doc_cache_dir):
+    pdfium = pytest.importorskip("pypdfium2")
+
+    short_pdf = str(tmp_path / "short.pdf")
+    short = pdfium.PdfDocument.new()
+    short.import_pages(pdfium.PdfDocument(sample_pdf), [0, 1])
+    short.save(short_pdf)
+
+    return [sample_pdf, short_pdf]
+
+
+def test_classify_pdfs_matches_classify_pdf(documents):
+    expected = [classify_model.classify_pdf(path, use_cache=False, mode="model") for path in documents]
+
+    assert classify_model.classify_pdfs(documents, workers=1, use_cache=False, mode="model") == expected
+    # cold cache with two extraction workers, then every document from the cache
+    assert classify_model.classify_pdfs(documents, workers=2, mode="model") == expected
+    assert classify_model.classify_pdfs(documents, workers=1, mode="model") == expected
+
+
+def test_hybrid_labels_match_model_labels(sample_pdf, doc_cache_dir):
+    model_labels = classify_model.classify_pdf(sample_pdf, use_cache=False, mode="model")
+    hybrid_labels = classify_model.classify_pdf(sample_pdf, use_cache=False, mode="hybrid")
+
+    assert [line["label"] for line in hybrid_labels] == [line["label"] for line in model_labels]
+    assert all("needs_review" in line for line in hybrid_labels)
+
+
+def f_matrix_of(word_counts, ends_with_punctuation):
+    f_matrix = np.zeros((len(word_counts), len(FEATURE_ORDER)))
+    f_matrix[:, FEATURE_ORDER.index("word_count")] = word_counts
+    f_matrix[:, FEATURE_ORDER.index("ends_with_punctuation")] = ends_with_punctuation
+    return f_matrix
+
+
+def test_rule_paragraphs_bypass_the_model(monkeypatch):
+    model, inv_label_map = classify_model.get_model()
+    asked = []
+    real_predict_proba = model.predict_proba
+    monkeypatch.setattr(model, "predict_proba", lambda rows: asked.append(rows.copy()) or real_predict_proba(rows))
+
+    # rule 1 (12+ words), rule 2 (8+ words ending in punctuation), then two lines for the model
+    f_matrix = f_matrix_of([12, 8, 8, 3], [0, 1, 0, 0])
+    pred, needs_review = classify_model.predict_labels(f_matrix, mode="hybrid")
+
+    assert len(asked) == 1 and asked[0].tolist() == f_matrix[2:].tolist()
+    assert [inv_label_map[label] for label in pred[:2]] == ["PARAGRAPH", "PARAGRAPH"]
+    assert not needs_review[:2].any()
+
+
+def test_needs_review_follows_the_threshold(monkeypatch):
+    f_matrix = f_matrix_of([12, 3, 2], [0, 0, 1])
+
+    monkeypatch.setattr(classify_model, "REVIEW_THRESHOLD", 1.01)
+    assert classify_model.predict_labels(f_matrix, mode="hybrid")[1].tolist() == [False, True, True]
+
+    monkeypatch.setattr(classify_model, "REVIEW_THRESHOLD", 0.0)
+    assert classify_model.predict_labels(f_matrix, mode="hybrid")[1].tolist() == [False, False, False]
+
+
+def test_hybrid_and_model_results_are_cached_side_by_side(sample_pdf, doc_cache_dir, monkeypatch):
+    model_labels = classify_model.classify_pdf(sample_pdf, mode="model")
+    hybrid_labels = classify_model.classify_pdf(sample_pdf, mode="hybrid")
+
+    def not_cached(*args, **kwargs):
+        raise AssertionError("classified again instead of read from the cache")
+
+    monkeypatch.setattr(classify_model, "predict_labels", not_cached)
+    assert classify_model.classify_pdf(sample_pdf, mode="model") == model_labels
+    assert classify_model.classify_pdf(sample_pdf, mode="hybrid") == hybrid_labels
+
+
+@pytest.mark.parametrize("profile_pages", [1, classify_model.PROFILE_PAGES])
+def test_streamed_labels_match_batch_with_warmup_profile(sample_pdf, doc_cache_dir, profile_pages):
+    expected = classify_model.classify_pdf(sample_pdf, use_cache=False, mode="model")
+
+    pages = classify_model.iter_classify_pdf(sample_pdf, profile_pages=profile_pages, use_cache=False, mode="model")
+
+    assert [line for page in pages for line in page] == expected
+
+
+def test_streamed_labels_match_batch_with_cached_profile(sample_pdf, doc_cache_dir):
+    # classify_pdf stores the whole-document profile the stream then starts from
+    expected = classify_model.classify_pdf(sample_pdf, mode="model")
+    assert doc_cache.load_cached_profile(sample_pdf, classify_model.extraction_variant(file_path=sample_pdf))
+
+    pages = classify_model.iter_classify_pdf(sample_pdf, profile_pages=1, mode="model")
+
+    assert [line for page in pages for line in page] == expected
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from rag_engine.converters.extract_classify import doc_cache
+
+
+@pytest.fixture
+def document(tmp_path, monkeypatch):
+    monkeypatch.setattr(doc_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.4 not really a pdf")
+    return str(path)
+
+
+def test_variants_of_a_document_live_side_by_side(document):
+    doc_cache.store_cached(document, "lines", "np-pdfplumber@2", ["plumber"])
+    doc_cache.store_cached(document, "lines", "np-pypdfium2@2", ["pdfium"])
+    doc_cache.store_cached(document, "classified", "np-pdfplumber@2-1-abc", ["model"])
+    doc_cache.store_cached(document, "classified", "np-pdfplumber-hybrid-0.7@2-1-abc", ["hybrid"])
+
+    assert doc_cache.load_cached(document, "lines", "np-pdfplumber@2") == ["plumber"]
+    assert doc_cache.load_cached(document, "lines", "np-pypdfium2@2") == ["pdfium"]
+    assert doc_cache.load_cached(document, "classified", "np-pdfplumber@2-1-abc") == ["model"]
+    assert doc_cache.load_cached(document, "classified", "np-pdfplumber-hybrid-0.7@2-1-abc") == ["hybrid"]
+
+
+def test_newer_version_replaces_only_its_own_variant(document):
+    doc_cache.store_cached(document, "lines", "np-pdfplumber@1", ["old"])
+    doc_cache.store_cached(document, "lines", "np-pypdfium2@1", ["other"])
+    doc_cache.store_cached(document, "lines", "np-pdfplumber@2", ["new"])
+
+    assert sorted(name.split(".")[2] for name in os.listdir(doc_cache.CACHE_DIR)) == ["np-pdfplumber@2", "np-pypdfium2@1"]
+
+
+def test_entries_from_before_variants_are_dropped(document):
+    sha = doc_cache.file_sha256(document)
+    os.makedirs(doc_cache.CACHE_DIR)
+    legacy = doc_cache.cache_file(sha, "lines", "2-np-pdfplumber")
+    open(legacy, "wb").close()
+
+    doc_cache.store_cached(document, "lines", "np-pdfplumber@2", ["new"])
+
+    assert not os.path.exists(legacy)
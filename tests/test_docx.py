@@ -0,0 +1,43 @@
+import pytest
+
+docx = pytest.importorskip("docx")
+
+from rag_engine.converters.extract_classify.extractor import extract_docx_lines, iter_docx_paragraphs
+
+
+@pytest.fixture
+def merged_table_docx(tmp_path):
+    document = docx.Document()
+    document.add_paragraph("Before the table.")
+
+    table = document.add_table(rows=3, cols=3)
+    table.cell(0, 0).merge(table.cell(0, 2)).text = "Merged header"
+    table.cell(1, 0).merge(table.cell(2, 0)).text = "Merged rows"
+    for row in range(1, 3):
+        for col in range(1, 3):
+            table.cell(row, col).text = f"Cell {row}{col}"
+
+    document.add_paragraph("After the table.")
+
+    path = tmp_path / "merged.docx"
+    document.save(path)
+    return str(path)
+
+
+def test_merged_cells_are_read_once(merged_table_docx):
+    texts = [p.text for p in iter_docx_paragraphs(docx.Document(merged_table_docx)) if p.text]
+
+    assert texts == [
+        "Before the table.",
+        "Merged header",
+        "Merged rows", "Cell 11", "Cell 12",
+        "Cell 21", "Cell 22",
+        "After the table."
+    ]
+
+
+def test_docx_lines_are_numbered_in_order(merged_table_docx):
+    lines = extract_docx_lines(merged_table_docx)
+
+    assert [line["line_index"] for line in lines] == list(range(len(lines)))
+    assert sum("Merged header" in line["text"] for line in lines) == 1
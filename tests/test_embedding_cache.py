@@ -0,0 +1,58 @@
+import numpy as np
+
+from rag_engine.embedding_cache import PENDING_FLUSH, EmbeddingCache
+
+
+def fake_encode(texts):
+    return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+
+
+def stored_rows(cache):
+    return cache.connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def test_new_vectors_are_written_at_flush_not_per_miss(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(path=path)
+
+    vectors = cache.encode(["a query", "another query"], fake_encode, "model")
+    cache.encode(["a third query"], fake_encode, "model")
+    assert stored_rows(cache) == 0
+
+    cache.flush()
+    assert stored_rows(cache) == 3
+
+    second = EmbeddingCache(path=path)
+    assert np.array_equal(second.encode(["a query", "another query"], fake_encode, "model"), vectors)
+    assert second.stats()["hits"] == 2
+
+
+def test_pending_vectors_are_written_once_enough_pile_up(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "embeddings.sqlite"))
+
+    for i in range(PENDING_FLUSH):
+        cache.encode([f"query {i}"], fake_encode, "model")
+
+    assert stored_rows(cache) == PENDING_FLUSH
+    assert not cache.pending
+
+
+def test_pending_vectors_are_served_before_they_are_written(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "embeddings.sqlite"), memory_entries=1)
+
+    first = cache.encode(["first text"], fake_encode, "model")
+    cache.encode(["second text"], fake_encode, "model")
+
+    assert np.array_equal(cache.encode(["first text"], fake_encode, "model"), first)
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+
+def test_embedding_cache_stays_bounded(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "embeddings.sqlite"), max_entries=5, memory_entries=2)
+
+    for i in range(7):
+        cache.encode([f"text {i}"], fake_encode, "model")
+        cache.flush()
+
+    assert stored_rows(cache) == 5
+    assert cache.rows == 5
@@ -0,0 +1,37 @@
+import threading
+
+from rag_engine import encoder
+
+
+def test_shards_never_drop_under_the_minimum_size():
+    texts = [f"text {i}" for i in range(256)]
+
+    shards = encoder.shard_texts(texts, workers=32)
+
+    assert [len(shard) for shard in shards] == [encoder.MIN_SHARD_TEXTS] * (256 // encoder.MIN_SHARD_TEXTS)
+    assert [text for shard in shards for text in shard] == texts
+
+
+def test_large_calls_get_a_few_shards_per_worker():
+    shards = encoder.shard_texts(list(range(4096)), workers=2)
+
+    assert len(shards) == 2 * encoder.SHARDS_PER_WORKER
+
+
+def test_threads_share_one_pool():
+    pools = []
+
+    # no shard is submitted, so no worker process (and no model) is ever started
+    def target():
+        pools.append(encoder.get_pool(2))
+
+    threads = [threading.Thread(target=target) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        assert len({id(pool) for pool in pools}) == 1
+    finally:
+        encoder.close_pool()
@@ -0,0 +1,29 @@
+from rag_engine.converters.extract_classify import extractor
+
+
+def test_split_page_ranges_covers_every_page_once():
+    for page_count in range(1, 12):
+        for workers in range(1, 6):
+            ranges = extractor.split_page_ranges(page_count, workers)
+            pages = [page for start, end in ranges for page in range(start, end)]
+
+            assert pages == list(range(page_count))
+            assert len(ranges) <= workers
+
+
+def test_split_page_ranges_without_pages():
+    assert extractor.split_page_ranges(0, 4) == []
+
+
+def test_extract_pdf_lines_without_pages(monkeypatch, sample_pdf):
+    monkeypatch.setattr(extractor, "count_pages", lambda pdf_path, backend: 0)
+
+    assert extractor.extract_pdf_lines(sample_pdf, workers=4) == []
+
+
+def test_parallel_extraction_matches_serial(sample_pdf):
+    serial = extractor.extract_pdf_lines(sample_pdf, workers=1)
+    parallel = extractor.extract_pdf_lines(sample_pdf, workers=3)
+
+    assert serial
+    assert parallel == serial
@@ -0,0 +1,59 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from rag_engine.converters.extract_classify import forest
+from rag_engine.converters.extract_classify.classify_model import MODEL_PATH
+from rag_engine.converters.extract_classify.extractor import extract_pdf_lines
+from rag_engine.converters.extract_classify.features import build_feature_matrix
+from rag_engine.converters.extract_classify.insights import DocumentProfile
+
+KERNELS = ["numpy", pytest.param("compiled", marks=pytest.mark.skipif(
+    forest.compiled_walk() is None, reason="numba is not installed"
+))]
+
+
+def flat_copy(artifact, tmp_path):
+    return forest.FlatForest.load(forest.export_forest(artifact, str(tmp_path / "forest")))
+
+
+@pytest.fixture(scope="module")
+def synthetic_data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 8)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + (X[:, 3] > 1)
+    return X, y
+
+
+@pytest.mark.parametrize("kernel", KERNELS)
+@pytest.mark.parametrize("estimator", [RandomForestClassifier, ExtraTreesClassifier])
+def test_flat_forest_matches_sklearn(estimator, kernel, synthetic_data, tmp_path):
+    X, y = synthetic_data
+    model = estimator(n_estimators=25, max_depth=12, random_state=0).fit(X[:1500], y[:1500])
+    flat = flat_copy({"model": model, "label_map": {"a": 0, "b": 1, "c": 2}}, tmp_path)
+
+    np.testing.assert_array_equal(flat.predict_proba(X[1500:], kernel=kernel), model.predict_proba(X[1500:]))
+    np.testing.assert_array_equal(flat.predict(X[1500:], kernel=kernel), model.predict(X[1500:]))
+
+
+@pytest.mark.parametrize("kernel", KERNELS)
+def test_flat_forest_matches_the_heading_classifier(kernel, sample_pdf, tmp_path):
+    artifact = joblib.load(MODEL_PATH)
+    lines = extract_pdf_lines(sample_pdf)
+    X = build_feature_matrix(lines, DocumentProfile.from_lines(lines).as_insights())
+    flat = flat_copy(artifact, tmp_path)
+
+    np.testing.assert_array_equal(flat.predict_proba(X, kernel=kernel), artifact["model"].predict_proba(X))
+
+
+def test_load_flat_forest_reuses_the_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(forest, "FOREST_CACHE_DIR", str(tmp_path))
+
+    first = forest.load_flat_forest(MODEL_PATH)
+    exports = []
+    monkeypatch.setattr(forest, "export_forest", lambda *args: exports.append(args))
+    second = forest.load_flat_forest(MODEL_PATH)
+
+    assert isinstance(first, forest.FlatForest) and isinstance(second, forest.FlatForest)
+    assert exports == []
@@ -0,0 +1,27 @@
+from rag_engine.converters.extract_classify import glue_check
+from rag_engine.converters.extract_classify.extractor import repair_sentence
+
+
+def test_spaced_prose_is_well_formed():
+    texts = ["The quick brown fox jumps over the lazy dog.", "It was a typical day at the office."]
+
+    assert glue_check.page_is_well_formed(texts)
+
+
+def test_glued_text_is_not_well_formed():
+    texts = ["Thequickbrownfoxjumpsoverthelazydog.", "Itwasatypicaldayattheoffice."]
+
+    assert not glue_check.page_is_well_formed(texts)
+
+
+def test_short_chunks_on_well_formed_pages_skip_segmentation():
+    assert not glue_check.chunk_needs_segmentation("endoh", True)
+    assert glue_check.chunk_needs_segmentation("endoh", False)
+    assert glue_check.chunk_needs_segmentation("representationlearning", True)
+
+
+def test_glued_known_word_is_still_segmented():
+    # "atypical" is a dictionary word, but on a glued page it is "a typical"
+    lines = [{"text": "Itwas Atypical dayattheofficeagain", "page_index": 0}]
+
+    assert repair_sentence(lines)[0]["text"] == "it was a typical day at the office again"
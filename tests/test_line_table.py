@@ -0,0 +1,49 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from rag_engine.converters.extract_classify import classify_model
+from rag_engine.converters.extract_classify.extractor import extract_pdf_lines
+from rag_engine.converters.extract_classify.features import build_feature_matrix
+from rag_engine.converters.extract_classify.insights import DocumentProfile
+from rag_engine.converters.extract_classify.line_table import LineTable
+
+
+@pytest.fixture(scope="module")
+def lines(sample_pdf):
+    return extract_pdf_lines(sample_pdf)
+
+
+def test_rows_read_back_as_the_original_dicts(lines):
+    table = LineTable.from_lines(lines)
+
+    assert len(table) == len(lines)
+    assert [row.to_dict() for row in table] == lines
+
+
+def test_table_survives_pickling(lines):
+    table = pickle.loads(pickle.dumps(LineTable.from_lines(lines)))
+
+    assert [row.to_dict() for row in table] == lines
+
+
+def test_profile_matches_line_dicts(lines):
+    table = LineTable.from_lines(lines)
+
+    assert DocumentProfile.from_lines(table).to_dict() == DocumentProfile.from_lines(lines).to_dict()
+
+
+def test_feature_matrix_matches_line_dicts(lines):
+    insights = DocumentProfile.from_lines(lines).as_insights()
+
+    np.testing.assert_array_equal(
+        build_feature_matrix(LineTable.from_lines(lines), insights),
+        build_feature_matrix(lines, insights)
+    )
+
+
+def test_classify_pdf_matches_line_dicts(lines, sample_pdf):
+    insights = DocumentProfile.from_lines(lines).as_insights()
+
+    assert classify_model.classify_pdf(sample_pdf, use_cache=False) == classify_model.classify_lines(lines, insights)
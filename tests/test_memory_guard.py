@@ -0,0 +1,26 @@
+import sys
+
+from rag_engine.converters.extract_classify import extractor, memory_guard
+
+
+def test_peak_rss_without_resource_module(monkeypatch):
+    # the resource module doesn't exist on Windows
+    monkeypatch.setitem(sys.modules, "resource", None)
+
+    assert memory_guard.peak_rss_mb() is None
+    assert memory_guard.format_mb(None) == "n/a"
+
+
+def test_ceiling_is_skipped_when_rss_is_unknown(monkeypatch):
+    monkeypatch.setattr(memory_guard, "current_rss_mb", lambda: None)
+
+    assert memory_guard.check_ceiling(1, "fail", 1, 10) is None
+
+
+def test_low_memory_extraction_matches_serial_and_stays_quiet(sample_pdf, monkeypatch, capsys):
+    monkeypatch.setattr(extractor, "EXTRACT_STATS", False)
+
+    lines = extractor.extract_pdf_lines_low_memory(sample_pdf, window=1, rss_ceiling_mb=0)
+
+    assert "pages/sec" not in capsys.readouterr().out
+    assert lines == extractor.extract_pdf_lines(sample_pdf, workers=1)
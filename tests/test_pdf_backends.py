@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from rag_engine.converters.extract_classify import pdf_backends
+
+# share of pdfplumber's words pypdfium2 reproduces (same text, top, size and font),
+# 94.4% on test.pdf when this was set
+MIN_WORD_PARITY = 0.93
+
+
+def test_default_backend_does_not_import_pypdfium2(sample_pdf):
+    code = (
+        "import sys\n"
+        "from rag_engine.converters.extract_classify import pdf_backends\n"
+        f"list(pdf_backends.iter_page_words({sample_pdf!r}, 'pdfplumber'))\n"
+        "print('pypdfium2' in sys.modules)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == "False"
+
+
+def test_unknown_backend_is_rejected(sample_pdf):
+    with pytest.raises(ValueError):
+        pdf_backends.iter_page_words(sample_pdf, "nope")
+
+
+def test_pypdfium2_word_parity(sample_pdf):
+    pytest.importorskip("pypdfium2")
+
+    assert pdf_backends.count_pages(sample_pdf, "pypdfium2") == pdf_backends.count_pages(sample_pdf, "pdfplumber")
+
+    result = pdf_backends.compare_backends(sample_pdf, "pypdfium2")
+    assert result["parity"] >= MIN_WORD_PARITY
+
+
+def test_compare_backends_on_a_pdf_without_words(tmp_path):
+    pdfium = pytest.importorskip("pypdfium2")
+
+    blank_pdf = str(tmp_path / "blank.pdf")
+    blank = pdfium.PdfDocument.new()
+    blank.new_page(595, 842)
+    blank.save(blank_pdf)
+
+    result = pdf_backends.compare_backends(blank_pdf)
+
+    assert result["total"] == 0
+    assert result["parity"] == 1.0
@@ -0,0 +1,89 @@
+import json
+import threading
+
+import pytest
+
+from rag_engine import pipeline
+
+
+class FailingCollection:
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def upsert(self, **kwargs):
+        raise RuntimeError("disk full")
+
+
+def fake_sections(file_path):
+    return [{"heading": "Heading", "chunks": [{"chunk_id": 0, "content": f"Text of {file_path}."}]}]
+
+
+@pytest.fixture
+def fake_pipeline(vector_db, monkeypatch):
+    # parse_document itself runs, on the path instead of classified pages
+    monkeypatch.setattr(pipeline, "classify_pdf", lambda file_path: file_path)
+    monkeypatch.setattr(pipeline, "build_structured_sections", lambda file_path: iter(fake_sections(file_path)))
+    monkeypatch.setattr(pipeline, "encode", vector_db.encode)
+    monkeypatch.setattr(pipeline, "get_collection", lambda: vector_db.collection)
+    return vector_db
+
+
+#run_pipeline in a thread, so a hang fails the test instead of blocking it
+def run_with_timeout(file_paths, timeout=30, **kwargs):
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = pipeline.run_pipeline(file_paths, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+
+    assert not thread.is_alive(), "run_pipeline hung"
+    return outcome
+
+
+def test_pipeline_indexes_every_document(fake_pipeline):
+    file_paths = [f"doc{i}.pdf" for i in range(5)]
+
+    outcome = run_with_timeout(file_paths, parse_workers=0, queue_size=1)
+
+    assert "error" not in outcome
+    assert sorted(outcome["result"]["summaries"]) == file_paths
+    assert fake_pipeline.collection.count() == 5
+
+
+def test_failed_write_is_raised_instead_of_hanging(fake_pipeline, monkeypatch):
+    monkeypatch.setattr(pipeline, "get_collection", lambda: FailingCollection(fake_pipeline.collection))
+
+    # more documents than the queues hold: the stages must not block once the writer has failed
+    outcome = run_with_timeout([f"doc{i}.pdf" for i in range(10)], parse_workers=0, queue_size=1)
+
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert fake_pipeline.collection.count() == 0
+
+
+def test_pipeline_persists_sections_as_jsonl(fake_pipeline, tmp_path):
+    persist_dir = tmp_path / "sections"
+
+    outcome = run_with_timeout(["doc0.pdf", "doc1.pdf"], parse_workers=0, persist_dir=str(persist_dir))
+
+    assert "error" not in outcome
+    for file_path in ("doc0.pdf", "doc1.pdf"):
+        with open(persist_dir / file_path.replace(".pdf", ".sections.jsonl"), encoding="utf-8") as f:
+            assert [json.loads(row) for row in f] == fake_sections(file_path)
+
+
+def test_pipeline_warns_that_streaming_is_ignored(fake_pipeline, monkeypatch, capsys):
+    monkeypatch.setattr(pipeline, "STREAM_INGESTION", True)
+
+    run_with_timeout(["doc0.pdf"], parse_workers=0)
+
+    assert "Warning: STREAM_INGESTION is ignored" in capsys.readouterr().out
@@ -0,0 +1,24 @@
+from rag_engine.converters.extract_classify.segment_cache import SegmentCache
+
+
+def test_segment_cache_stays_bounded(tmp_path):
+    cache = SegmentCache(path=str(tmp_path / "segments.sqlite"), max_entries=5, memory_entries=2)
+
+    for word in ["thecat", "onthemat", "hellothere", "goodmorning", "niceday", "bluesky", "greengrass"]:
+        cache.segment(word)
+        cache.flush()
+
+    rows = cache.connect().execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+    assert rows == 5
+    assert cache.rows == 5
+
+
+def test_segment_cache_serves_results_from_disk(tmp_path):
+    path = str(tmp_path / "segments.sqlite")
+    first = SegmentCache(path=path)
+    words = first.segment("thequickbrownfox")
+    first.flush()
+
+    second = SegmentCache(path=path)
+    assert second.segment("thequickbrownfox") == words
+    assert second.stats()["hits"] == 1
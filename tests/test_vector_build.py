@@ -0,0 +1,133 @@
+import json
+import os
+
+import pytest
+
+from rag_engine.converters import vector_build
+
+
+def sections(*contents):
+    return [
+        {"heading": f"Heading {i}", "chunks": [{"chunk_id": 0, "content": content}]}
+        for i, content in enumerate(contents)
+    ]
+
+
+def stored_sources(collection):
+    return sorted({metadata["source"] for metadata in collection.get(include=["metadatas"])["metadatas"]})
+
+
+def test_documents_built_through_the_shared_json_path_both_survive(vector_db, tmp_path):
+    structured_json = str(tmp_path / "structured.json")
+
+    for source, content in (("first.pdf", "Alpha text of the first document."), ("second.pdf", "Beta text of the second one.")):
+        with open(structured_json, "w", encoding="utf-8") as f:
+            json.dump(sections(content), f)
+        vector_build.build_vector_db(structured_json, source)
+
+    assert vector_db.collection.count() == 2
+    assert stored_sources(vector_db.collection) == ["first.pdf", "second.pdf"]
+
+
+def test_documents_indexed_in_memory_both_survive(vector_db):
+    vector_build.index_sections(sections("Shared words.", "Only in one."), source="one.pdf")
+    vector_build.index_sections(sections("Shared words.", "Only in two."), source="two.pdf")
+
+    assert vector_db.collection.count() == 4
+    assert stored_sources(vector_db.collection) == ["one.pdf", "two.pdf"]
+
+
+def test_source_is_required(vector_db):
+    with pytest.raises(TypeError):
+        vector_build.index_sections(sections("Some text."))
+    with pytest.raises(ValueError):
+        vector_build.index_sections(sections("Some text."), source="")
+
+
+def test_remove_document_only_drops_its_own_chunks(vector_db):
+    vector_build.index_sections(sections("Kept text."), source="keep.pdf")
+    vector_build.index_sections(sections("Removed text."), source="drop.pdf")
+
+    vector_build.remove_document("drop.pdf")
+
+    assert stored_sources(vector_db.collection) == ["keep.pdf"]
+
+
+def test_reindexing_an_unchanged_document_embeds_nothing(vector_db):
+    vector_build.index_sections(sections("First text.", "Second text."), source="doc.pdf", incremental=True)
+    vector_db.encoded.clear()
+
+    counts = vector_build.index_sections(sections("First text.", "Second text."), source="doc.pdf", incremental=True)
+
+    assert vector_db.encoded == []
+    assert counts == {"added": 0, "updated": 0, "removed": 0, "unchanged": 2, "embedded": 0}
+
+
+def test_incremental_diff_embeds_only_what_changed(vector_db):
+    vector_build.index_sections(sections("Kept text.", "Old text.", "Dropped text."), source="doc.pdf", incremental=True)
+    vector_db.encoded.clear()
+
+    counts = vector_build.index_sections(sections("Kept text.", "New text."), source="doc.pdf", incremental=True)
+
+    assert len(vector_db.encoded) == 1 and "New text." in vector_db.encoded[0]
+    assert counts == {"added": 0, "updated": 1, "removed": 1, "unchanged": 1, "embedded": 1}
+    assert vector_db.collection.count() == 2
+
+
+def test_moved_chunks_keep_their_embedding(vector_db):
+    vector_build.index_sections(sections("Moved text."), source="doc.pdf", incremental=True)
+    vector_db.encoded.clear()
+
+    moved = [{"heading": "Heading 0", "chunks": []}] + sections("Moved text.")
+    counts = vector_build.index_sections(moved, source="doc.pdf", incremental=True)
+
+    assert vector_db.encoded == []
+    assert counts["unchanged"] == 1
+    assert vector_db.collection.get(include=["metadatas"])["metadatas"][0]["section"] == 1
+
+
+def test_encoder_change_embeds_the_document_again(vector_db, monkeypatch):
+    vector_build.index_sections(sections("First text.", "Second text."), source="doc.pdf", incremental=True)
+    vector_db.encoded.clear()
+
+    monkeypatch.setattr(vector_build, "ENCODER_KEY", "other-model|onnx")
+    counts = vector_build.index_sections(sections("First text.", "Second text."), source="doc.pdf", incremental=True)
+
+    assert len(vector_db.encoded) == 2
+    assert counts == {"added": 0, "updated": 2, "removed": 0, "unchanged": 0, "embedded": 2}
+    metadatas = vector_db.collection.get(include=["metadatas"])["metadatas"]
+    assert {metadata["encoder"] for metadata in metadatas} == {"other-model|onnx"}
+
+
+def test_legacy_chunks_are_dropped_once(vector_db):
+    vector_build.index_sections(sections("Current text."), source="doc.pdf")
+    vector_db.collection.add(
+        ids=["0_0", "0123456789abcdef-0123456789abcdef"],
+        embeddings=[[0.0] * 32, [0.0] * 32],
+        documents=["Old text.", "Old id scheme."],
+        metadatas=[{"heading": "Old"}, {"heading": "Old", "doc_id": "0123456789abcdef", "source": "doc.pdf"}]
+    )
+
+    vector_build.migrate_collection(vector_db.collection)
+
+    assert vector_db.collection.count() == 1
+    assert stored_sources(vector_db.collection) == ["doc.pdf"]
+    assert vector_db.collection.metadata["chunk_id_version"] == vector_build.CHUNK_ID_VERSION
+
+
+def test_document_id_survives_moving_the_repo(tmp_path, monkeypatch):
+    doc_id = vector_build.document_id(os.path.join(vector_build.ROOT_DIR, "docs", "a.pdf"))
+    assert vector_build.document_id(os.path.join("docs", "a.pdf")) == doc_id
+
+    monkeypatch.setattr(vector_build, "ROOT_DIR", str(tmp_path / "moved"))
+    assert vector_build.document_id(str(tmp_path / "moved" / "docs" / "a.pdf")) == doc_id
+
+
+def test_prune_drops_documents_whose_file_is_gone(vector_db, tmp_path):
+    kept, gone = tmp_path / "kept.pdf", tmp_path / "gone.pdf"
+    kept.write_bytes(b"")
+    vector_build.index_sections(sections("Kept text."), source=str(kept))
+    vector_build.index_sections(sections("Gone text."), source=str(gone))
+
+    assert vector_build.prune_missing_documents(vector_db.collection) == [str(gone)]
+    assert stored_sources(vector_db.collection) == [str(kept)]